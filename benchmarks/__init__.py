@@ -0,0 +1,27 @@
+"""
+Performance benchmarks for kiwimarket.
+
+The default settings module, benchmarks.settings, points at a local SQLite file:
+
+    export DJANGO_SETTINGS_MODULE=benchmarks.settings
+    python manage.py makemigrations user product nearby search
+    python manage.py migrate
+    python manage.py seed_marketplace --scale 10
+    python -m benchmarks                    # compare against benchmarks/baseline.json, fails without one
+    python -m benchmarks --strict-latency   # also fail when p95 latency regresses
+    python -m benchmarks --save-baseline    # record a new baseline
+
+The committed baseline was recorded against --scale 10.
+"""
+import os, sys
+
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+def setup():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
@@ -0,0 +1,43 @@
+import argparse, sys
+
+from benchmarks import setup, suite
+
+def main():
+    parser = argparse.ArgumentParser(description=suite.__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=suite.TOLERANCE)
+    parser.add_argument('--latency-floor', type=float, default=suite.LATENCY_FLOOR_MS)
+    parser.add_argument('--strict-latency', action='store_true', help='fail on latency regressions too')
+    parser.add_argument('--baseline', default=str(suite.BASELINE))
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    setup()
+    results = suite.run(args.iterations, args.warmup)
+
+    print(f'{"endpoint":<16} {"p50":>9} {"p95":>9} {"p99":>9} {"queries":>8}')
+    for name, result in results.items():
+        print(f'{name:<16} {result["p50_ms"]:>7.2f}ms {result["p95_ms"]:>7.2f}ms {result["p99_ms"]:>7.2f}ms {result["queries"]:>8}')
+
+    if args.save_baseline:
+        suite.save_baseline(results, args.baseline)
+        print(f'baseline written to {args.baseline}')
+        return
+
+    baseline = suite.load_baseline(args.baseline)
+    if not baseline:
+        print(f'no baseline at {args.baseline}, run with --save-baseline to record one', file=sys.stderr)
+        sys.exit(2)
+
+    queries, latency = suite.compare(results, baseline, args.tolerance, args.latency_floor)
+    regressions      = queries + latency if args.strict_latency else queries
+    if latency and not args.strict_latency:
+        print('\nslower than baseline (advisory, --strict-latency to fail)', *latency, sep='\n  ', file=sys.stderr)
+    if regressions:
+        print('\nPERFORMANCE REGRESSION', *regressions, sep='\n  ', file=sys.stderr)
+        sys.exit(1)
+    print('\nno regressions against baseline')
+
+if __name__ == '__main__':
+    main()
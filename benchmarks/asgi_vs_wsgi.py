@@ -0,0 +1,74 @@
+"""
+Requests per second of the sync (WSGI) views against their async (ASGI) twins
+at the same concurrency, both driven in-process through Django's test clients
+against whatever database the settings point at.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 32 --requests 2000
+"""
+import argparse, asyncio, time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup
+
+PAIRS = [
+    ('/product/list/all', '/product/async/list/all'),
+    ('/product/{product_id}', '/product/async/{product_id}'),
+    ('/nearby', '/nearby/async'),
+]
+
+def run_wsgi(path, requests, concurrency):
+    from django.test import Client
+
+    def worker(count):
+        client = Client()
+        for _ in range(count):
+            assert client.get(path).status_code == 200, path
+
+    counts = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start  = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, counts))
+    return requests / (time.perf_counter() - start)
+
+def run_asgi(path, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client    = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                assert response.status_code == 200, path
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from product.models import Product
+
+    product_id = Product.objects.filter(deleted_at__isnull=True).values_list('id', flat=True).first()
+    if product_id is None:
+        raise SystemExit('no products to benchmark, run `manage.py seed_marketplace` first')
+
+    print(f'{"endpoint":<32} {"wsgi rps":>10} {"asgi rps":>10} {"ratio":>7}')
+    for sync_path, async_path in PAIRS:
+        sync_path  = sync_path.format(product_id=product_id)
+        async_path = async_path.format(product_id=product_id)
+        wsgi       = run_wsgi(sync_path, args.requests, args.concurrency)
+        asgi       = run_asgi(async_path, args.requests, args.concurrency)
+        print(f'{sync_path:<32} {wsgi:>10.1f} {asgi:>10.1f} {asgi / wsgi:>6.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+from benchmarks.settings import *
+
+# Primary and replica as two SQLite files, for trying the read-replica router locally.
+# SQLite does not replicate, so refresh the replica by copying the primary file:
+#
+#     export DJANGO_SETTINGS_MODULE=benchmarks.replica_settings
+#     python manage.py migrate
+#     cp bench.sqlite3 bench_replica.sqlite3
+#
+# Reads of replica_reads views then come from bench_replica.sqlite3 until the client
+# writes, after which they stay on bench.sqlite3 for REPLICA_PIN_SECONDS.
+DATABASES = {
+    'default' : {
+        'ENGINE' : 'django.db.backends.sqlite3',
+        'NAME'   : BASE_DIR / 'bench.sqlite3',
+    },
+    'replica' : {
+        'ENGINE' : 'django.db.backends.sqlite3',
+        'NAME'   : BASE_DIR / 'bench_replica.sqlite3',
+        'TEST'   : {'MIRROR' : 'default'},
+    },
+}
@@ -0,0 +1,16 @@
+from kiwimarket.settings import *
+
+# Benchmarks run against a local SQLite file so results do not depend on a shared MySQL server.
+DEBUG     = False
+DATABASES = {
+    'default' : {
+        'ENGINE' : 'django.db.backends.sqlite3',
+        'NAME'   : BASE_DIR / 'bench.sqlite3',
+    }
+}
+# a single local process needs no memcached
+CACHES    = {
+    'default' : {
+        'BACKEND' : 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
@@ -0,0 +1,92 @@
+"""
+Latency percentiles and query counts for the main endpoints, compared against a
+stored baseline. A run fails when an endpoint issues more queries than its baseline.
+Wall times vary between machines and runs, so a p95 that grows past the tolerance,
+and by at least LATENCY_FLOOR_MS, is only reported unless latency is made strict.
+"""
+import json, time, statistics
+
+from pathlib import Path
+
+BASELINE  = Path(__file__).resolve().parent / 'baseline.json'
+TOLERANCE        = 0.25
+LATENCY_FLOOR_MS = 10.0
+
+def percentile(samples, ratio):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(ratio * (len(samples) - 1))))]
+
+def cases():
+    import jwt
+
+    from my_settings    import SECRET_KEY, ALGORITHM
+    from user.models    import FullAddress
+    from product.models import Product
+    from nearby.models  import Nearby
+
+    product_id = Product.objects.filter(deleted_at__isnull=True).values_list('id', flat=True).first()
+    nearby_id  = Nearby.objects.filter(deleted_at__isnull=True).values_list('id', flat=True).first()
+    user_id    = FullAddress.objects.filter(user__isnull=False).values_list('user_id', flat=True).first()
+    if not (product_id and nearby_id and user_id):
+        raise SystemExit('nothing to benchmark, run `manage.py seed_marketplace` first')
+
+    token = jwt.encode({'user_id' : user_id}, SECRET_KEY, algorithm=ALGORITHM)
+    return {
+        'product_list'   : ('/product/list/all', {}),
+        'product_sorted' : ('/product/list/all?sort=price', {}),
+        'product_detail' : (f'/product/{product_id}', {}),
+        'product_feed'   : ('/product/feed', {'HTTP_AUTHORIZATION' : token}),
+        'nearby_list'    : ('/nearby', {}),
+        'nearby_detail'  : (f'/nearby/{nearby_id}', {}),
+    }
+
+def measure(path, headers, iterations, warmup):
+    from django.db         import connection
+    from django.test       import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    for _ in range(warmup):
+        client.get(path, **headers)
+
+    latencies = []
+    queries   = 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start    = time.perf_counter()
+            response = client.get(path, **headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f'{path} answered {response.status_code}: {response.content[:200]!r}')
+        queries = max(queries, len(captured))
+
+    return {
+        'p50_ms'  : round(percentile(latencies, 0.50), 3),
+        'p95_ms'  : round(percentile(latencies, 0.95), 3),
+        'p99_ms'  : round(percentile(latencies, 0.99), 3),
+        'mean_ms' : round(statistics.mean(latencies), 3),
+        'queries' : queries,
+    }
+
+def run(iterations=200, warmup=20):
+    return {name : measure(path, headers, iterations, warmup) for name, (path, headers) in cases().items()}
+
+def compare(results, baseline, tolerance=TOLERANCE, floor_ms=LATENCY_FLOOR_MS):
+    """Returns (query regressions, latency regressions) against baseline."""
+    queries, latency = [], []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result['queries'] > expected['queries']:
+            queries.append(f'{name}: {result["queries"]} queries, baseline {expected["queries"]}')
+        allowed = max(expected['p95_ms'] * tolerance, floor_ms)
+        if result['p95_ms'] > expected['p95_ms'] + allowed:
+            latency.append(f'{name}: p95 {result["p95_ms"]}ms, baseline {expected["p95_ms"]}ms (+{allowed:.1f}ms allowed)')
+    return queries, latency
+
+def load_baseline(path=BASELINE):
+    return json.loads(Path(path).read_text()) if Path(path).exists() else {}
+
+def save_baseline(results, path=BASELINE):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
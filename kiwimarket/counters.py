@@ -0,0 +1,112 @@
+import atexit, os, threading, logging
+
+from collections import defaultdict
+
+from django.apps      import apps
+from django.conf      import settings
+from django.db        import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+class BufferedWriter:
+    """
+    Base for in-memory write buffers that a daemon thread flushes every
+    flush_interval seconds and once more at interpreter exit, dropping broken or
+    expired connections first. Subclasses implement flush(); the thread is started
+    lazily, once per process.
+    """
+    def __init__(self, flush_interval=10):
+        self.flush_interval = flush_interval
+        self.lock           = threading.Lock()
+        self.flush_lock     = threading.Lock()
+        self.stopped        = threading.Event()
+        self.thread         = None
+        self.pid            = None
+        atexit.register(self.stop)
+
+    def flush(self):
+        raise NotImplementedError
+
+    def start(self):
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid():
+                return
+            self.pid    = os.getpid()
+            self.thread = threading.Thread(target=self.run, name=f'{type(self).__name__}-flush', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush_connected()
+
+    def stop(self):
+        self.stopped.set()
+        self.flush_connected()
+
+    def flush_connected(self):
+        # the flush thread serves no requests, so nothing else recycles its connection
+        # after a database error or restart
+        close_old_connections()
+        self.flush()
+
+class ViewCounter(BufferedWriter):
+    """
+    Write-behind buffer for the `viewed` column of Product and Nearby.
+
+    Page views are added up in memory and written out as one
+    `UPDATE ... SET viewed = viewed + n WHERE id IN (...)` per distinct increment,
+    on the BufferedWriter schedule or once flush_threshold rows are pending.
+    A failed flush puts its deltas back so no count is lost.
+    """
+    def __init__(self, field='viewed', flush_interval=10, flush_threshold=1000):
+        super().__init__(flush_interval)
+        self.field           = field
+        self.flush_threshold = flush_threshold
+        self.pending         = defaultdict(int)
+
+    def incr(self, model, pk, amount=1):
+        with self.lock:
+            self.pending[(model._meta.label, pk)] += amount
+            size = len(self.pending)
+        self.start()
+        if size >= self.flush_threshold:
+            self.flush()
+
+    def pending_for(self, model, pk):
+        with self.lock:
+            return self.pending.get((model._meta.label, pk), 0)
+
+    def merged(self, instance):
+        return (getattr(instance, self.field) or 0) + self.pending_for(type(instance), instance.pk)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                pending      = self.pending
+                self.pending = defaultdict(int)
+            if not pending:
+                return 0
+
+            batches = defaultdict(list)
+            for (label, pk), amount in pending.items():
+                batches[(label, amount)].append(pk)
+
+            try:
+                with transaction.atomic():
+                    for (label, amount), pks in batches.items():
+                        apps.get_model(label).objects.filter(pk__in=pks).update(**{self.field : F(self.field) + amount})
+            except Exception:
+                logger.exception('view counter flush failed, keeping %d pending rows', len(pending))
+                with self.lock:
+                    for key, amount in pending.items():
+                        self.pending[key] += amount
+                return 0
+            return len(pending)
+
+view_counter = ViewCounter(
+    flush_interval  = getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10),
+    flush_threshold = getattr(settings, 'VIEW_COUNTER_FLUSH_THRESHOLD', 1000),
+)
@@ -0,0 +1,91 @@
+import threading
+
+from bisect import bisect_left
+
+# Upper bounds in milliseconds; the last, implicit bucket is +Inf.
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency        = Histogram()
+        self.sql_queries    = 0
+        self.sql_ms         = 0.0
+        self.response_bytes = 0
+        self.n_plus_one     = 0
+        self.statuses       = {}
+
+class MetricsRegistry:
+    """
+    Per-view request metrics for one process. Every worker keeps its own registry,
+    so a scrape reports the worker that served it.
+    """
+    def __init__(self):
+        self.views = {}
+        self.lock  = threading.Lock()
+
+    def record(self, view, status, wall_ms, sql_queries, sql_ms, response_bytes, n_plus_one):
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            metrics.latency.observe(wall_ms)
+            metrics.sql_queries    += sql_queries
+            metrics.sql_ms         += sql_ms
+            metrics.response_bytes += response_bytes
+            metrics.n_plus_one     += 1 if n_plus_one else 0
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = [
+            '# HELP kiwimarket_request_duration_ms Wall time per request in milliseconds.',
+            '# TYPE kiwimarket_request_duration_ms histogram',
+        ]
+        counters = {
+            'kiwimarket_requests_total'        : ('Requests served.', []),
+            'kiwimarket_sql_queries_total'     : ('SQL queries executed.', []),
+            'kiwimarket_sql_duration_ms_total' : ('Time spent in SQL in milliseconds.', []),
+            'kiwimarket_response_bytes_total'  : ('Response body bytes sent.', []),
+            'kiwimarket_n_plus_one_total'      : ('Requests that repeated the same SQL shape.', []),
+        }
+
+        with self.lock:
+            for view, metrics in sorted(self.views.items()):
+                label = 'view="{}"'.format(view.replace('\\', '\\\\').replace('"', '\\"'))
+                for bound, total in metrics.latency.cumulative():
+                    lines.append(f'kiwimarket_request_duration_ms_bucket{{{label},le="{bound}"}} {total}')
+                lines.append(f'kiwimarket_request_duration_ms_sum{{{label}}} {metrics.latency.sum:.3f}')
+                lines.append(f'kiwimarket_request_duration_ms_count{{{label}}} {metrics.latency.count}')
+
+                for status, count in sorted(metrics.statuses.items()):
+                    counters['kiwimarket_requests_total'][1].append(f'{{{label},status="{status}"}} {count}')
+                counters['kiwimarket_sql_queries_total'][1].append(f'{{{label}}} {metrics.sql_queries}')
+                counters['kiwimarket_sql_duration_ms_total'][1].append(f'{{{label}}} {metrics.sql_ms:.3f}')
+                counters['kiwimarket_response_bytes_total'][1].append(f'{{{label}}} {metrics.response_bytes}')
+                counters['kiwimarket_n_plus_one_total'][1].append(f'{{{label}}} {metrics.n_plus_one}')
+
+        for name, (description, samples) in counters.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{sample}' for sample in samples)
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
@@ -0,0 +1,198 @@
+import time, random, asyncio, logging, threading
+
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf                import settings
+from django.db                  import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import registry
+from .routers import replica_health, primary_pinned, primary_written, WriteTracker
+
+logger = logging.getLogger('kiwimarket.slow_requests')
+
+# The collector of the request being served. Worker threads started with sync_to_async
+# (sync views under ASGI, utils.run_query) run in a copy of the request's context, so
+# their queries reach the same collector.
+query_collector = ContextVar('query_collector', default=None)
+
+def collect_queries(execute, sql, params, many, context):
+    collector = query_collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+def install_query_collector(connection, **kwargs):
+    if collect_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(collect_queries)
+
+connection_created.connect(install_query_collector)
+
+class QueryCollector:
+    """Counts and times every query of a request, from whichever thread runs it."""
+    def __init__(self):
+        self.count  = 0
+        self.millis = 0.0
+        self.shapes = Counter()
+        self.lock   = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            millis = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.millis += millis
+                self.count  += 1
+                # Parameters are passed separately, so the SQL text itself is the query shape.
+                self.shapes[sql] += 1
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.shapes.most_common(3) if count >= threshold]
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively in both modes, like MiddlewareMixin: under
+    ASGI __call__ returns the coroutine of acall(), so no request is moved to the
+    single thread that sync-only middleware is adapted onto.
+    """
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # makes asyncio.iscoroutinefunction(self) true, which is how Django tells
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if getattr(self, '_is_coroutine', None):
+            return self.acall(request)
+        return self.call(request)
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Records wall time, SQL query count and time, response size and N+1 suspects per
+    resolved view into kiwimarket.metrics.registry, and logs a sample of slow requests.
+    Queries are counted on every thread working for the request, including the worker
+    threads of async views. Streaming responses are recorded once their body has been
+    sent, so the rows fetched while streaming count too; a stream the server closes
+    before reading is not recorded.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.slow_ms     = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+        self.sample_rate = getattr(settings, 'METRICS_SLOW_SAMPLE_RATE', 1.0)
+        self.n_plus_one  = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 5)
+        # connections opened before this module was imported
+        for connection in connections.all():
+            install_query_collector(connection)
+
+    def call(self, request):
+        collector = QueryCollector()
+        start     = time.perf_counter()
+        token     = query_collector.set(collector)
+        try:
+            response = self.get_response(request)
+        finally:
+            query_collector.reset(token)
+        return self.finish(request, response, collector, start)
+
+    async def acall(self, request):
+        collector = QueryCollector()
+        start     = time.perf_counter()
+        token     = query_collector.set(collector)
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_collector.reset(token)
+        return self.finish(request, response, collector, start)
+
+    def finish(self, request, response, collector, start):
+        if response.streaming:
+            response.streaming_content = self.stream(request, response, response.streaming_content, collector, start)
+        else:
+            self.record(request, response, collector, start, len(response.content))
+        return response
+
+    def stream(self, request, response, content, collector, start):
+        size     = 0
+        iterator = iter(content)
+        try:
+            while True:
+                # set around each step only, since the server may resume the stream elsewhere
+                token = query_collector.set(collector)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    query_collector.reset(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, collector, start, size)
+
+    def record(self, request, response, collector, start, size):
+        wall_ms = (time.perf_counter() - start) * 1000
+        match   = request.resolver_match
+        view    = match.view_name if match else 'unresolved'
+        suspect = collector.repeated(self.n_plus_one)
+
+        registry.record(view, response.status_code, wall_ms, collector.count, collector.millis, size, suspect)
+
+        if wall_ms >= self.slow_ms and random.random() < self.sample_rate:
+            logger.warning(
+                'slow request %s %s view=%s status=%s wall=%.1fms sql=%d/%.1fms bytes=%d repeated=%s',
+                request.method, request.get_full_path(), view, response.status_code,
+                wall_ms, collector.count, collector.millis, size,
+                [(sql[:200], count) for sql, count in suspect]
+            )
+
+class ReplicaPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    Pins a request to the primary when it writes, or when the client wrote within the
+    last REPLICA_PIN_SECONDS (tracked with a cookie), so users read their own writes.
+    Sync requests also health-check this thread's persistent connections first; async
+    requests query on run_query worker threads, which recycle their own connections.
+    """
+    cookie_name = 'db_pin'
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def call(self, request):
+        replica_health.check()
+
+        tracker, tokens = self.enter(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.exit(tokens)
+        return self.finish(response, tracker)
+
+    async def acall(self, request):
+        tracker, tokens = self.enter(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.exit(tokens)
+        return self.finish(response, tracker)
+
+    def enter(self, request):
+        pinned  = request.method not in ('GET', 'HEAD', 'OPTIONS') or self.cookie_name in request.COOKIES
+        tracker = WriteTracker()
+        return tracker, (primary_pinned.set(pinned), primary_written.set(tracker))
+
+    def exit(self, tokens):
+        pinned_token, written_token = tokens
+        primary_pinned.reset(pinned_token)
+        primary_written.reset(written_token)
+
+    def finish(self, response, tracker):
+        if tracker.written and self.pin_seconds:
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,112 @@
+import time, asyncio, logging
+
+from contextvars import ContextVar
+from functools   import wraps
+
+from django.conf import settings
+from django.db   import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DATABASE = getattr(settings, 'REPLICA_DATABASE', 'replica')
+
+# These flags are per request: ReplicaPinMiddleware resets them once the response is built.
+replica_allowed = ContextVar('replica_allowed', default=False)
+primary_pinned  = ContextVar('primary_pinned', default=False)
+primary_written = ContextVar('primary_written', default=None)
+
+class WriteTracker:
+    """
+    Whether the request wrote. Worker threads run in copies of the request's context,
+    so a write is recorded on this shared object rather than by setting a variable.
+    """
+    def __init__(self):
+        self.written = False
+
+def wrote():
+    tracker = primary_written.get()
+    return tracker is not None and tracker.written
+
+class ReplicaHealth:
+    """Takes the replica out of rotation for retry_seconds after a failed health check."""
+    def __init__(self, alias, retry_seconds=30):
+        self.alias         = alias
+        self.retry_seconds = retry_seconds
+        self.down_until    = 0.0
+
+    @property
+    def configured(self):
+        return self.alias in settings.DATABASES
+
+    def available(self):
+        return self.configured and time.monotonic() >= self.down_until
+
+    def check(self):
+        """
+        Drops persistent connections that went bad while idle, like CONN_HEALTH_CHECKS
+        does in newer Django. Only connections this thread already holds are pinged.
+        """
+        for connection in connections.all():
+            if connection.connection is None or connection.is_usable():
+                continue
+            connection.close()
+            if connection.alias == self.alias:
+                logger.warning('replica %s failed its health check, reading from primary for %ds', self.alias, self.retry_seconds)
+                self.down_until = time.monotonic() + self.retry_seconds
+
+replica_health = ReplicaHealth(REPLICA_DATABASE, getattr(settings, 'REPLICA_RETRY_SECONDS', 30))
+
+class ReplicaRouter:
+    """
+    Reads go to the replica only inside views marked with replica_reads, and only while
+    the request is not pinned to the primary. Any write pins the rest of the request,
+    and ReplicaPinMiddleware carries the pin over to the client's next requests.
+    """
+    def db_for_read(self, model, **hints):
+        if replica_allowed.get() and not (primary_pinned.get() or wrote()) and replica_health.available():
+            return REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        tracker = primary_written.get()
+        if tracker is not None:
+            tracker.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+def allow_replica():
+    # outside ReplicaPinMiddleware the view still needs a tracker to pin itself on a write
+    tracker = None if primary_written.get() is not None else primary_written.set(WriteTracker())
+    return replica_allowed.set(True), tracker
+
+def disallow_replica(tokens):
+    allowed_token, tracker_token = tokens
+    replica_allowed.reset(allowed_token)
+    if tracker_token is not None:
+        primary_written.reset(tracker_token)
+
+def replica_reads(func):
+    """Lets the reads of a read-only view (sync or async) be served by the replica."""
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            tokens = allow_replica()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                disallow_replica(tokens)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        tokens = allow_replica()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            disallow_replica(tokens)
+    return wrapper
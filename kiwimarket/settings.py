@@ -42,10 +42,13 @@ INSTALLED_APPS = [
     'corsheaders',
     'user',
     'product',
-    'nearby'
+    'nearby',
+    'search',
 ]
 
 MIDDLEWARE = [
+    'kiwimarket.middleware.MetricsMiddleware',
+    'kiwimarket.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +84,27 @@ WSGI_APPLICATION = 'kiwimarket.wsgi.application'
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 DATABASES = my_settings.DATABASES
 
+# Keep connections open between requests; ReplicaPinMiddleware health-checks them.
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE', 60)
+
+# Reads of views marked with kiwimarket.routers.replica_reads go to DATABASES['replica']
+# when my_settings defines it, otherwise everything stays on 'default'.
+DATABASE_ROUTERS = ['kiwimarket.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Version stamps and invalidations (category tree, keyword alarms, login cache, profiles,
+# SMS limits) must be seen by every worker, so the default cache is a shared memcached
+# rather than the per-process LocMem default. my_settings may point it elsewhere;
+# kiwimarket/test_settings.py and benchmarks/settings.py use LocMem.
+CACHES = getattr(my_settings, 'CACHES', {
+    'default' : {
+        'BACKEND'  : 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION' : '127.0.0.1:11211',
+    }
+})
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -119,6 +143,41 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+#VIEW_COUNTER(kiwimarket/counters.py)
+VIEW_COUNTER_FLUSH_INTERVAL  = 10
+VIEW_COUNTER_FLUSH_THRESHOLD = 1000
+
+#KEYWORD_ALARM(user/alarms.py)
+KEYWORD_ALARM_FLUSH_INTERVAL = 5
+KEYWORD_ALARM_BATCH_SIZE     = 500
+KEYWORD_ALARM_MAX_RETRIES    = 3
+KEYWORD_ALARM_MAX_PENDING    = 10000
+
+#METRICS(kiwimarket/middleware.py)
+METRICS_SLOW_REQUEST_MS      = 500
+METRICS_SLOW_SAMPLE_RATE     = 0.1
+METRICS_N_PLUS_ONE_THRESHOLD = 5
+
+#METRICS_ENDPOINT(views.py)
+# without a token /metrics answers 403; loopback is not listed because proxied requests come from it
+METRICS_ALLOWED_IPS = ()
+METRICS_TOKEN       = getattr(my_settings, 'METRICS_TOKEN', None)
+
+#SMS_AUTH(user/sms.py)
+SMS_CODE_TTL        = 180
+SMS_MAX_ATTEMPTS    = 5
+SMS_RESEND_INTERVAL = 30
+SMS_HOURLY_LIMIT    = 10
+SMS_SENDER          = None
+
+#CATEGORY_TREE(product/categories.py)
+CATEGORY_TREE_TTL = 300
+
+#READ_REPLICA(kiwimarket/routers.py)
+REPLICA_DATABASE      = 'replica'
+REPLICA_PIN_SECONDS   = 5
+REPLICA_RETRY_SECONDS = 30
+
 #REMOVE_APPEND_SLASH_WARNING
 APPEND_SLASH = False
 
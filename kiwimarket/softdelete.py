@@ -0,0 +1,64 @@
+from django.db       import models, transaction
+from django.dispatch import Signal
+from django.utils    import timezone
+
+# Sent after a bulk soft delete with sender=model and pks=[...]. QuerySet.update()
+# skips post_save, so anything kept in sync from `deleted_at` listens here as well.
+soft_deleted = Signal()
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def dead(self):
+        return self.filter(deleted_at__isnull=False)
+
+    def soft_delete(self):
+        """
+        Stamps deleted_at on every live row in one UPDATE, cascades to the relations
+        named in the model's soft_delete_cascade and sends soft_deleted.
+        Returns the number of rows deleted at this level.
+        """
+        model = self.model
+        with transaction.atomic():
+            pks = list(self.alive().values_list('pk', flat=True))
+            if not pks:
+                return 0
+
+            model._base_manager.filter(pk__in=pks).update(deleted_at=timezone.now())
+            for accessor in model.soft_delete_cascade:
+                relation = related_object(model, accessor)
+                relation.related_model.objects.filter(**{f'{relation.field.name}__in' : pks}).soft_delete()
+
+            soft_deleted.send(sender=model, pks=pks)
+        return len(pks)
+
+def related_object(model, accessor):
+    for relation in model._meta.related_objects:
+        if relation.get_accessor_name() == accessor:
+            return relation
+    raise ValueError(f'{model.__name__} has no reverse relation {accessor}')
+
+class SoftDeleteModel(models.Model):
+    """
+    Base for every kiwimarket model: a nullable deleted_at column, `objects.alive()`
+    for live rows, and bulk or per-row soft delete that cascades to
+    soft_delete_cascade (reverse relation accessors such as 'productimage_set').
+    """
+    deleted_at = models.DateTimeField(null = True)
+
+    objects = SoftDeleteQuerySet.as_manager()
+
+    soft_delete_cascade = ()
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self):
+        if self.deleted_at is not None:
+            return
+        with transaction.atomic():
+            self.deleted_at = timezone.now()
+            self.save(update_fields=['deleted_at'])
+            for accessor in self.soft_delete_cascade:
+                getattr(self, accessor).all().soft_delete()
@@ -0,0 +1,45 @@
+from itertools import islice
+
+from django.http                  import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+
+BUFFER_SIZE = 64 * 1024
+
+# JsonResponse calls json.dumps(data, cls=DjangoJSONEncoder); an encoder built
+# with the same defaults produces the same bytes, one row at a time.
+encoder = DjangoJSONEncoder()
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def stream_json(rows, envelope=None, key='result'):
+    """
+    Yields the bytes of json.dumps({**envelope, key: list(rows)}, cls=DjangoJSONEncoder)
+    without holding the list, buffering about BUFFER_SIZE bytes per yield.
+    """
+    envelope = encoder.encode(dict(envelope or {}))
+    head     = envelope[:-1] + (', ' if envelope != '{}' else '') + encoder.encode(key) + ': ['
+
+    buffer = [head]
+    size   = len(head)
+    for index, row in enumerate(rows):
+        part = encoder.encode(row) if index == 0 else ', ' + encoder.encode(row)
+        buffer.append(part)
+        size += len(part)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode()
+            buffer = []
+            size   = 0
+
+    buffer.append(']}')
+    yield ''.join(buffer).encode()
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    def __init__(self, rows, envelope=None, key='result', **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(stream_json(rows, envelope, key), **kwargs)
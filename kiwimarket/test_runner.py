@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+
+class TestRunner(DiscoverRunner):
+    """
+    Drops what the tests left in the in-memory write buffers before the test database
+    goes away; their exit-time flush would otherwise write to the real database.
+    """
+    def teardown_databases(self, old_config, **kwargs):
+        from kiwimarket.counters import view_counter
+        from user.alarms         import alarm_queue
+
+        with view_counter.lock:
+            view_counter.pending.clear()
+        with alarm_queue.lock:
+            alarm_queue.pending = []
+        super().teardown_databases(old_config, **kwargs)
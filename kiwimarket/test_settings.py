@@ -0,0 +1,18 @@
+from kiwimarket.settings import *
+
+# Tests run on SQLite and the per-process LocMem cache, so they need neither MySQL nor memcached.
+# manage.py picks this module for `python manage.py test` unless DJANGO_SETTINGS_MODULE is set.
+DATABASES = {
+    'default' : {
+        'ENGINE' : 'django.db.backends.sqlite3',
+        'NAME'   : BASE_DIR / 'test.sqlite3',
+    }
+}
+CACHES    = {
+    'default' : {
+        'BACKEND' : 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# drops buffered view counts and alarms before the test database is destroyed
+TEST_RUNNER = 'kiwimarket.test_runner.TestRunner'
@@ -13,8 +13,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.urls import path
+from django.urls import path, include
 
-urlpatterns = [
+from views import metrics
 
+urlpatterns = [
+    path('metrics', metrics),
+    path('product', include('product.urls')),
+    path('nearby', include('nearby.urls')),
+    path('search', include('search.urls')),
+    path('user', include('user.urls')),
 ]
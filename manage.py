@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kiwimarket.settings')
+    # tests need neither MySQL nor memcached, see kiwimarket/test_settings.py
+    default_settings = 'kiwimarket.test_settings' if sys.argv[1:2] == ['test'] else 'kiwimarket.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class NearbyConfig(AppConfig):
     name = 'nearby'
+
+    def ready(self):
+        from . import signals
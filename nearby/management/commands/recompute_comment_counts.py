@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+
+from kiwimarket.streaming import chunked
+from nearby.models        import Nearby
+
+class Command(BaseCommand):
+    help = 'Recompute every nearby post\'s comment count from the nearbycomments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recomputed = 0
+        nearby_ids = Nearby.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=options['chunk_size'])
+        for chunk in chunked(nearby_ids, options['chunk_size']):
+            with transaction.atomic():
+                Nearby.recompute_comment_counts(chunk)
+            recomputed += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed comment counts for {recomputed} nearby posts'))
@@ -1,49 +1,79 @@
-from django.db import models
+from django.db        import models, transaction
+from django.db.models import F, Count
 
-from user.models    import Address, User
-from product.models import MainCategory
+from kiwimarket.softdelete import SoftDeleteModel
+from user.models           import Address, User
+from product.models        import MainCategory
 
-class NearbyCategory(models.Model):
+class NearbyCategory(SoftDeleteModel):
     name          = models.CharField(max_length=100)
     main_category = models.ForeignKey('product.MainCategory', on_delete = models.SET_NULL, null=True)
     created_at    = models.DateTimeField(auto_now_add = True) 
-    deleted_at    = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'nearbycategories'
 
-class Nearby(models.Model):
+class Nearby(SoftDeleteModel):
     name            = models.CharField(max_length=100)
     price           = models.DecimalField(max_digits= 7, decimal_places=2)
     nearby_category = models.ForeignKey('NearbyCategory', on_delete = models.SET_NULL, null=True)
     uploader        = models.ForeignKey('user.User', on_delete = models.SET_NULL, null=True, related_name='uploader_nearby')
-    viewed          = models.IntegerField(null=True)
+    viewed          = models.IntegerField(default=0)
+    comment_count   = models.IntegerField(default=0)
     address         = models.ForeignKey('user.Address', on_delete = models.SET_NULL, null=True, related_name='address_nearby')
     description     = models.CharField(max_length=2000)
     created_at      = models.DateTimeField(auto_now_add = True) 
     updated_at      = models.DateTimeField(auto_now = True)
     comment         = models.ManyToManyField('user.User', through = 'NearbyComment')
     created_at      = models.DateTimeField(auto_now_add = True) 
-    deleted_at      = models.DateTimeField(null = True) 
+
+    soft_delete_cascade = ('nearbyimage_set', 'nearbycomment_set')
 
     class Meta:
         db_table = 'nearbys'
+        indexes  = [
+            models.Index(fields=['deleted_at', 'created_at', 'id'], name='nearbys_created_id_idx'),
+            models.Index(fields=['deleted_at', 'viewed', 'id'], name='nearbys_viewed_id_idx'),
+            models.Index(fields=['nearby_category', 'deleted_at', 'created_at', 'id'], name='nearbys_category_created_idx'),
+            models.Index(fields=['address', 'deleted_at', 'created_at', 'id'], name='nearbys_address_created_idx'),
+        ]
+
+    @classmethod
+    def adjust_comment_count(cls, nearby_id, delta):
+        cls.objects.filter(id=nearby_id).update(comment_count=F('comment_count') + delta)
 
-class NearbyImage(models.Model):
+    @classmethod
+    def recompute_comment_counts(cls, nearby_ids):
+        counts  = dict(NearbyComment.objects.alive().filter(nearby_id__in=nearby_ids)
+            .values('nearby_id').annotate(count=Count('id')).order_by().values_list('nearby_id', 'count'))
+        nearbys = [cls(id=nearby_id, comment_count=counts.get(nearby_id, 0)) for nearby_id in nearby_ids]
+        cls.objects.bulk_update(nearbys, ['comment_count'])
+
+class NearbyImage(SoftDeleteModel):
     nearby     = models.ForeignKey('Nearby', on_delete = models.SET_NULL, null=True)
     image_url  = models.URLField(max_length = 2000, null=True)
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'nearbyimages'
+        indexes  = [
+            models.Index(fields=['nearby', 'deleted_at'], name='nearbyimages_nearby_idx'),
+        ]
 
-class NearbyComment(models.Model):
+class NearbyComment(SoftDeleteModel):
     user       = models.ForeignKey('user.User', on_delete = models.SET_NULL, null=True)
     nearby     = models.ForeignKey('Nearby', on_delete = models.SET_NULL, null=True)
     content    = models.CharField(max_length=2000)
-    created_at = models.DateTimeField(auto_now = True)
-    deleted_at = models.DateTimeField(null = True) 
+    created_at = models.DateTimeField(auto_now_add = True)
+    updated_at = models.DateTimeField(auto_now = True)
     
     class Meta:
-        db_table='nearbycomments'
\ No newline at end of file
+        db_table = 'nearbycomments'
+        indexes  = [
+            models.Index(fields=['nearby', 'deleted_at', 'created_at', 'id'], name='nearbycomments_thread_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # keeps Nearby.comment_count, maintained in post_save, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
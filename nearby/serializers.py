@@ -0,0 +1,79 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from kiwimarket.counters  import view_counter
+from kiwimarket.streaming import chunked
+from product.categories   import category_tree
+
+from .models import Nearby, NearbyImage, NearbyComment
+
+def image_prefetch():
+    return Prefetch(
+        'nearbyimage_set',
+        queryset = NearbyImage.objects.alive().order_by('id'),
+        to_attr  = 'images'
+    )
+
+def feed_queryset(queryset=None):
+    if queryset is None:
+        queryset = Nearby.objects.all()
+
+    return queryset.select_related(
+        'uploader',
+        'address',
+    ).prefetch_related(image_prefetch())
+
+def serialize_nearby(nearby, categories=None):
+    categories = categories or category_tree.get()
+    category   = categories.nearby_categories.get(nearby.nearby_category_id)
+    uploader   = nearby.uploader
+    address    = nearby.address
+
+    return {
+        "id"            : nearby.id,
+        "name"          : nearby.name,
+        "price"         : int(nearby.price),
+        "description"   : nearby.description,
+        "category_id"   : nearby.nearby_category_id,
+        "category"      : category.name if category else None,
+        "uploader"      : {
+            "id"              : uploader.id,
+            "nickname"        : uploader.nickname,
+            "profile_picture" : uploader.profile_picture,
+            "manner_score"    : float(uploader.manner_score),
+        } if uploader else None,
+        "address"       : address.address if address else None,
+        "viewed"        : view_counter.merged(nearby),
+        "comment_count" : nearby.comment_count,
+        "image_url"     : [image.image_url for image in nearby.images],
+        "created_at"    : nearby.created_at,
+    }
+
+def iter_serialized(queryset, chunk_size=1000):
+    """
+    Serializes a large queryset chunk by chunk over a server-side cursor.
+    iterator() skips prefetch_related, so images are fetched per chunk instead.
+    """
+    categories = category_tree.get()
+    rows       = feed_queryset(queryset).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        prefetch_related_objects(chunk, image_prefetch())
+        for nearby in chunk:
+            yield serialize_nearby(nearby, categories)
+
+def comment_queryset(nearby_id):
+    return NearbyComment.objects.alive().filter(nearby_id=nearby_id).select_related('user')
+
+def serialize_comment(comment):
+    user = comment.user
+
+    return {
+        "id"         : comment.id,
+        "content"    : comment.content,
+        "user"       : {
+            "id"              : user.id,
+            "nickname"        : user.nickname,
+            "profile_picture" : user.profile_picture,
+        } if user else None,
+        "created_at" : comment.created_at,
+        "updated_at" : comment.updated_at,
+    }
@@ -0,0 +1,41 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch          import receiver
+
+from kiwimarket.softdelete import soft_deleted
+
+from .models import Nearby, NearbyComment
+
+def comment_contribution(nearby_id, deleted_at):
+    if nearby_id is None or deleted_at is not None:
+        return None
+    return nearby_id
+
+@receiver(pre_save, sender=NearbyComment)
+def remember_comment_nearby(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = NearbyComment.objects.filter(pk=instance.pk).values('nearby_id', 'deleted_at').first()
+    instance._previous_nearby = comment_contribution(**previous) if previous else None
+
+@receiver(post_save, sender=NearbyComment)
+def update_comment_count(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_nearby', None)
+    current  = comment_contribution(instance.nearby_id, instance.deleted_at)
+    if previous == current:
+        return
+
+    if previous:
+        Nearby.adjust_comment_count(previous, -1)
+    if current:
+        Nearby.adjust_comment_count(current, 1)
+
+@receiver(post_delete, sender=NearbyComment)
+def remove_comment_count(sender, instance, **kwargs):
+    current = comment_contribution(instance.nearby_id, instance.deleted_at)
+    if current:
+        Nearby.adjust_comment_count(current, -1)
+
+@receiver(soft_deleted, sender=NearbyComment)
+def recompute_deleted_comments(sender, pks, **kwargs):
+    nearby_ids = set(NearbyComment.objects.filter(pk__in=pks, nearby__isnull=False).values_list('nearby_id', flat=True))
+    Nearby.recompute_comment_counts(sorted(nearby_ids))
@@ -1,3 +1,64 @@
-from django.test import TestCase
+import json, jwt
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test       import TestCase
+
+from my_settings import SECRET_KEY, ALGORITHM
+from user.models import User
+
+from .models import Nearby, NearbyComment
+from .views  import COMMENT_PAGE_SIZE
+
+class NearbyCommentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.nearby = Nearby.objects.create(name='산책', price=0, description='')
+        self.author = User.objects.create(phone_number='+821000000001', nickname='author', email='author@kiwimarket.com')
+        self.other  = User.objects.create(phone_number='+821000000002', nickname='other', email='other@kiwimarket.com')
+
+    def token(self, user):
+        return jwt.encode({'user_id' : user.id}, SECRET_KEY, algorithm=ALGORITHM)
+
+    def url(self, comment_id=None):
+        return f'/nearby/{self.nearby.id}/comments' + (f'/{comment_id}' if comment_id else '')
+
+    def comment_count(self):
+        return Nearby.objects.get(id=self.nearby.id).comment_count
+
+    def post(self, content, user=None):
+        return self.client.post(self.url(), json.dumps({'content' : content}), content_type='application/json', HTTP_AUTHORIZATION=self.token(user or self.author))
+
+    def test_comment_count_follows_posts_and_deletes(self):
+        comment_id = self.post('같이 가요').json()['result']['id']
+        self.post('저도요')
+        self.assertEqual(self.comment_count(), 2)
+
+        self.assertEqual(self.client.delete(self.url(comment_id), HTTP_AUTHORIZATION=self.token(self.other)).status_code, 403)
+        self.assertEqual(self.client.delete(self.url(comment_id), HTTP_AUTHORIZATION=self.token(self.author)).status_code, 200)
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_thread_pages_cover_every_comment_once(self):
+        NearbyComment.objects.bulk_create([
+            NearbyComment(nearby=self.nearby, user=self.author, content=f'comment {index}') for index in range(COMMENT_PAGE_SIZE * 2 + 5)
+        ])
+        expected = list(NearbyComment.objects.order_by('created_at', 'id').values_list('id', flat=True))
+
+        seen, params = [], {}
+        for _ in range(5):
+            page = self.client.get(self.url(), params).json()
+            seen.extend(comment['id'] for comment in page['result'])
+            if page['next_cursor'] is None:
+                break
+            params = {'cursor' : page['next_cursor']}
+
+        self.assertEqual(seen, expected)
+
+    def test_empty_comment_is_rejected(self):
+        self.assertEqual(self.post('   ').status_code, 400)
+
+class NearbyListTest(TestCase):
+    def test_non_numeric_filters_are_rejected(self):
+        for params, message in (({'category' : 'x'}, 'INVALID_CATEGORY'), ({'address' : '1;'}, 'INVALID_ADDRESS')):
+            response = self.client.get('/nearby', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], message)
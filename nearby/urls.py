@@ -0,0 +1,21 @@
+from django.urls import path
+
+from .views import (
+    NearbyListView,
+    NearbyDetailView,
+    NearbyExportView,
+    NearbyCommentView,
+    NearbyCommentDetailView,
+    async_nearby_list,
+    async_nearby_detail
+)
+
+urlpatterns = [
+    path('', NearbyListView.as_view()),
+    path('/export', NearbyExportView.as_view()),
+    path('/async', async_nearby_list),
+    path('/async/<int:nearby_id>', async_nearby_detail),
+    path('/<int:nearby_id>', NearbyDetailView.as_view()),
+    path('/<int:nearby_id>/comments', NearbyCommentView.as_view()),
+    path('/<int:nearby_id>/comments/<int:comment_id>', NearbyCommentDetailView.as_view()),
+]
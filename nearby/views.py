@@ -1,3 +1,192 @@
-from django.shortcuts import render
+import json, asyncio
 
-# Create your views here.
+from django.views     import View
+from django.http      import JsonResponse
+from django.db.models import Q
+
+from kiwimarket.counters  import view_counter
+from kiwimarket.routers   import replica_reads
+from kiwimarket.streaming import StreamingJsonResponse
+from product.categories   import category_tree
+from utils                import login_check, keyset_paginate, run_query
+
+from .models      import Nearby, NearbyImage, NearbyComment
+from .serializers import feed_queryset, serialize_nearby, iter_serialized, comment_queryset, serialize_comment
+
+PAGE_SIZE         = 20
+COMMENT_PAGE_SIZE = 20
+COMMENT_ORDERING  = ('created_at', 'id')
+EXPORT_CHUNK_SIZE = 1000
+NEARBY_SORTS      = {
+    "new"     : ('-created_at', '-id'),
+    "popular" : ('-viewed', '-id'),
+}
+
+def list_nearbys(params):
+    """Returns (nearbys, next_cursor) for a list request; raises ValueError with the error message."""
+    category_seq = params.get('category', None)
+    address_seq  = params.get('address', None)
+    sort         = params.get('sort', 'new')
+
+    if category_seq and not category_seq.isdigit():
+        raise ValueError('INVALID_CATEGORY')
+    if address_seq and not address_seq.isdigit():
+        raise ValueError('INVALID_ADDRESS')
+    if sort not in NEARBY_SORTS:
+        raise ValueError('INVALID_SORT')
+
+    q = Q()
+    if category_seq:
+        q &= Q(nearby_category_id=category_seq)
+    if address_seq:
+        q &= Q(address_id=address_seq)
+
+    return keyset_paginate(
+        feed_queryset(Nearby.objects.alive().filter(q)),
+        NEARBY_SORTS[sort],
+        cursor = params.get('cursor', None),
+        limit  = PAGE_SIZE
+    )
+
+class NearbyListView(View):
+    @replica_reads
+    def get(self, request):
+        try:
+            nearbys, next_cursor = list_nearbys(request.GET)
+        except ValueError as error:
+            return JsonResponse({"message" : str(error)}, status=400)
+
+        categories = category_tree.get()
+        return JsonResponse({
+            "message"     : "SUCCESS",
+            "result"      : [serialize_nearby(nearby, categories) for nearby in nearbys],
+            "next_cursor" : next_cursor,
+        }, status=200)
+
+class NearbyDetailView(View):
+    @replica_reads
+    def get(self, request, nearby_id):
+        nearby = feed_queryset(Nearby.objects.alive().filter(id=nearby_id)).first()
+        if not nearby:
+            return JsonResponse({"message" : "NEARBY_DOES_NOT_EXIST"}, status=404)
+
+        view_counter.incr(Nearby, nearby.id)
+
+        return JsonResponse({"result" : serialize_nearby(nearby, category_tree.get())}, status=200)
+
+class NearbyCommentView(View):
+    @replica_reads
+    def get(self, request, nearby_id):
+        if not Nearby.objects.alive().filter(id=nearby_id).exists():
+            return JsonResponse({"message" : "NEARBY_DOES_NOT_EXIST"}, status=404)
+
+        try:
+            comments, next_cursor = keyset_paginate(
+                comment_queryset(nearby_id),
+                COMMENT_ORDERING,
+                cursor = request.GET.get('cursor', None),
+                limit  = COMMENT_PAGE_SIZE
+            )
+        except ValueError as error:
+            return JsonResponse({"message" : str(error)}, status=400)
+
+        return JsonResponse({
+            "message"     : "SUCCESS",
+            "result"      : [serialize_comment(comment) for comment in comments],
+            "next_cursor" : next_cursor,
+        }, status=200)
+
+    @login_check
+    def post(self, request, nearby_id):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        try:
+            content = json.loads(request.body)['content'].strip()
+        except (json.JSONDecodeError, KeyError, AttributeError):
+            return JsonResponse({"message" : "KEY_ERROR"}, status=400)
+        if not content:
+            return JsonResponse({"message" : "EMPTY_CONTENT"}, status=400)
+
+        if not Nearby.objects.alive().filter(id=nearby_id).exists():
+            return JsonResponse({"message" : "NEARBY_DOES_NOT_EXIST"}, status=404)
+
+        comment = NearbyComment.objects.create(nearby_id=nearby_id, user=request.user, content=content)
+        return JsonResponse({"message" : "SUCCESS", "result" : serialize_comment(comment)}, status=201)
+
+class NearbyCommentDetailView(View):
+    @login_check
+    def patch(self, request, nearby_id, comment_id):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        try:
+            content = json.loads(request.body)['content'].strip()
+        except (json.JSONDecodeError, KeyError, AttributeError):
+            return JsonResponse({"message" : "KEY_ERROR"}, status=400)
+        if not content:
+            return JsonResponse({"message" : "EMPTY_CONTENT"}, status=400)
+
+        comment = comment_queryset(nearby_id).filter(id=comment_id).first()
+        if not comment:
+            return JsonResponse({"message" : "COMMENT_DOES_NOT_EXIST"}, status=404)
+        if comment.user_id != request.user.id:
+            return JsonResponse({"message" : "FORBIDDEN"}, status=403)
+
+        comment.content = content
+        comment.save(update_fields=['content', 'updated_at'])
+        return JsonResponse({"message" : "SUCCESS", "result" : serialize_comment(comment)}, status=200)
+
+    @login_check
+    def delete(self, request, nearby_id, comment_id):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        comment = NearbyComment.objects.alive().filter(nearby_id=nearby_id, id=comment_id).first()
+        if not comment:
+            return JsonResponse({"message" : "COMMENT_DOES_NOT_EXIST"}, status=404)
+        if comment.user_id != request.user.id:
+            return JsonResponse({"message" : "FORBIDDEN"}, status=403)
+
+        comment.soft_delete()
+        return JsonResponse({"message" : "SUCCESS"}, status=200)
+
+class NearbyExportView(View):
+    @login_check
+    def get(self, request):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({"message" : "FORBIDDEN"}, status=403)
+
+        nearbys = Nearby.objects.alive().order_by('id')
+        return StreamingJsonResponse(iter_serialized(nearbys, EXPORT_CHUNK_SIZE), {"message" : "SUCCESS"})
+
+@replica_reads
+async def async_nearby_list(request):
+    categories = await run_query(category_tree.get)
+    try:
+        nearbys, next_cursor = await run_query(lambda: list_nearbys(request.GET))
+    except ValueError as error:
+        return JsonResponse({"message" : str(error)}, status=400)
+
+    return JsonResponse({
+        "message"     : "SUCCESS",
+        "result"      : [serialize_nearby(nearby, categories) for nearby in nearbys],
+        "next_cursor" : next_cursor,
+    }, status=200)
+
+@replica_reads
+async def async_nearby_detail(request, nearby_id):
+    nearby, images, categories = await asyncio.gather(
+        run_query(lambda: Nearby.objects.alive().select_related('uploader', 'address').filter(id=nearby_id).first()),
+        run_query(lambda: list(NearbyImage.objects.alive().filter(nearby_id=nearby_id).order_by('id'))),
+        run_query(category_tree.get),
+    )
+    if not nearby:
+        return JsonResponse({"message" : "NEARBY_DOES_NOT_EXIST"}, status=404)
+
+    nearby.images = images
+    view_counter.incr(Nearby, nearby.id)
+
+    return JsonResponse({"result" : serialize_nearby(nearby, categories)}, status=200)
@@ -0,0 +1,88 @@
+import hashlib, json, threading, time
+
+from collections import namedtuple
+
+from django.conf       import settings
+from django.core.cache import cache
+
+from nearby.models import NearbyCategory
+
+from .models import MainCategory, ProductCategory
+
+CategoryNode = namedtuple('CategoryNode', ['id', 'name', 'main_category_id'])
+
+class CategorySnapshot:
+    def __init__(self, version, main_categories, product_categories, nearby_categories):
+        self.version            = version
+        self.loaded_at          = time.monotonic()
+        self.main_categories    = {row['id'] : row['name'] for row in main_categories}
+        self.product_categories = {row['id'] : CategoryNode(**row) for row in product_categories}
+        self.nearby_categories  = {row['id'] : CategoryNode(**row) for row in nearby_categories}
+        self.product_children   = self.group(self.product_categories)
+        self.nearby_children    = self.group(self.nearby_categories)
+        self.body               = json.dumps({"message" : "SUCCESS", "result" : self.as_tree()}).encode()
+        self.etag               = '"{}"'.format(hashlib.md5(self.body).hexdigest())
+
+    def group(self, nodes):
+        children = {}
+        for node in nodes.values():
+            children.setdefault(node.main_category_id, []).append(node.id)
+        return {main_id : tuple(ids) for main_id, ids in children.items()}
+
+    def as_tree(self):
+        return [{
+            "id"                 : main_id,
+            "name"               : name,
+            "product_categories" : [self.product_categories[id]._asdict() for id in self.product_children.get(main_id, ())],
+            "nearby_categories"  : [self.nearby_categories[id]._asdict() for id in self.nearby_children.get(main_id, ())],
+        } for main_id, name in self.main_categories.items()]
+
+class CategoryTree:
+    """
+    Whole category hierarchy held in memory, one copy per process. Category saves,
+    deletes and soft deletes bump a version stamp in the shared Django cache; the next
+    lookup in any process sees the new stamp and reloads. A snapshot is also reloaded
+    after ttl seconds, in case the stamp was evicted and restarted at a version a
+    process already holds.
+    """
+    VERSION_KEY = 'category_tree_version'
+
+    def __init__(self, ttl=300):
+        self.snapshot = None
+        self.ttl      = ttl
+        self.lock     = threading.Lock()
+
+    def fresh(self, snapshot, version):
+        return snapshot is not None and snapshot.version == version and time.monotonic() - snapshot.loaded_at < self.ttl
+
+    def version(self):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, 1, None)
+            version = cache.get(self.VERSION_KEY, 1)
+        return version
+
+    def bump(self):
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 1, None)
+        self.snapshot = None
+
+    def get(self):
+        version  = self.version()
+        snapshot = self.snapshot
+        if self.fresh(snapshot, version):
+            return snapshot
+
+        with self.lock:
+            if not self.fresh(self.snapshot, version):
+                self.snapshot = CategorySnapshot(
+                    version,
+                    MainCategory.objects.alive().order_by('id').values('id', 'name'),
+                    ProductCategory.objects.alive().order_by('id').values('id', 'name', 'main_category_id'),
+                    NearbyCategory.objects.alive().order_by('id').values('id', 'name', 'main_category_id'),
+                )
+            return self.snapshot
+
+category_tree = CategoryTree(ttl=getattr(settings, 'CATEGORY_TREE_TTL', 300))
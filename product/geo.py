@@ -0,0 +1,54 @@
+import math
+
+# The map is split into a 0.01 degree grid, roughly 1.1km per cell along latitude.
+CELL_SIZE            = 0.01
+CELLS_PER_ROW        = int(round(360 / CELL_SIZE))
+EARTH_RADIUS         = 6371.0
+KM_PER_DEGREE        = math.pi * EARTH_RADIUS / 180
+DEFAULT_ACCESS_RANGE = 3
+MAX_ACCESS_RANGE     = 10
+
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(latitude1), float(longitude1), float(latitude2), float(longitude2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+def cell_index(latitude, longitude):
+    return (
+        int(math.floor((float(latitude) + 90) / CELL_SIZE)),
+        int(math.floor((float(longitude) + 180) / CELL_SIZE)),
+    )
+
+def cell_of(latitude, longitude):
+    row, col = cell_index(latitude, longitude)
+    return row * CELLS_PER_ROW + col
+
+def access_range_of(access_range):
+    if not access_range or access_range <= 0:
+        return DEFAULT_ACCESS_RANGE
+    return min(access_range, MAX_ACCESS_RANGE)
+
+def covering_cells(latitude, longitude, access_range):
+    """
+    Cells that come within access_range (km) of the given point. A cell is kept when its
+    nearest point is in range, so no covered cell is missed; the feed trims the few
+    false positives at cell edges with an exact haversine check.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    access_range        = access_range_of(access_range)
+    lat_span            = access_range / KM_PER_DEGREE
+    lon_span            = access_range / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+
+    min_row, min_col = cell_index(latitude - lat_span, longitude - lon_span)
+    max_row, max_col = cell_index(latitude + lat_span, longitude + lon_span)
+
+    cells = []
+    for row in range(min_row, max_row + 1):
+        cell_lat_min = row * CELL_SIZE - 90
+        nearest_lat  = min(max(latitude, cell_lat_min), cell_lat_min + CELL_SIZE)
+        for col in range(min_col, max_col + 1):
+            cell_lon_min = col * CELL_SIZE - 180
+            nearest_lon  = min(max(longitude, cell_lon_min), cell_lon_min + CELL_SIZE)
+            if haversine(latitude, longitude, nearest_lat, nearest_lon) <= access_range:
+                cells.append(row * CELLS_PER_ROW + col)
+    return cells
@@ -0,0 +1,74 @@
+import csv, json, sys, time
+
+from django.core.management.base import BaseCommand
+
+from kiwimarket.streaming import chunked
+from product.models       import Product, ProductImage
+
+FIELDS = ['name', 'price', 'category', 'address_code', 'uploader', 'description', 'access_range', 'order_status', 'images']
+
+class Command(BaseCommand):
+    help = 'Export live products and their images as JSONL or CSV, in the format import_products reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default=None)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path       = options['path']
+        format     = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        chunk_size = options['chunk_size']
+
+        file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            writer = csv.DictWriter(file, fieldnames=FIELDS) if format == 'csv' else None
+            if writer:
+                writer.writeheader()
+
+            started  = time.monotonic()
+            exported = 0
+            for chunk in chunked(self.rows(chunk_size), chunk_size):
+                for row in chunk:
+                    if writer:
+                        writer.writerow(dict(row, images='|'.join(row['images'])))
+                    else:
+                        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+                exported += len(chunk)
+                self.stderr.write(f'{exported} exported, {exported / max(time.monotonic() - started, 1e-6):,.0f} products/s')
+        finally:
+            if file is not sys.stdout:
+                file.close()
+
+    def rows(self, chunk_size):
+        products = Product.objects.alive().order_by('id').values_list(
+            'id',
+            'name',
+            'price',
+            'product_category__name',
+            'address__code',
+            'uploader__nickname',
+            'description',
+            'access_range',
+            'order_status__name',
+        )
+        for chunk in chunked(products.iterator(chunk_size=chunk_size), chunk_size):
+            images = {}
+            for product_id, image_url in ProductImage.objects.filter(
+                product_id__in     = [row[0] for row in chunk],
+                deleted_at__isnull = True
+            ).order_by('id').values_list('product_id', 'image_url'):
+                images.setdefault(product_id, []).append(image_url)
+
+            for id, name, price, category, address_code, uploader, description, access_range, order_status in chunk:
+                yield {
+                    "name"         : name,
+                    "price"        : str(price),
+                    "category"     : category,
+                    "address_code" : address_code,
+                    "uploader"     : uploader,
+                    "description"  : description,
+                    "access_range" : access_range,
+                    "order_status" : order_status,
+                    "images"       : images.get(id, []),
+                }
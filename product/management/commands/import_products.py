@@ -0,0 +1,167 @@
+import csv, json, os, time
+
+from collections import defaultdict, deque
+from decimal     import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db                   import connection, transaction
+from django.db.models            import Max
+
+from user.models    import User, Address, OrderStatus
+from product.geo    import covering_cells
+from product.models import Product, ProductImage, ProductCoverage, ProductCategory, ImportCheckpoint
+from search.index   import postings_for
+from search.models  import SearchPosting
+
+class Command(BaseCommand):
+    help = '''Import products and their images from JSONL or CSV in constant memory.
+
+Each row has name, price, category (product category name), address_code,
+uploader (nickname), description and optionally access_range, order_status
+(status name) and images (a list in JSONL, "|"-separated in CSV). Progress is
+checkpointed in the importcheckpoints table in the same transaction as every
+chunk; run again with --resume to continue. Rows whose address_code matches
+more than one address, or whose category matches more than one product
+category, are skipped. Keyword alarms are not fired for imported
+products.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default=None)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--checkpoint', default=None, help='checkpoint name, the absolute input path by default')
+        parser.add_argument('--resume', action='store_true')
+
+    def handle(self, *args, **options):
+        path       = options['path']
+        format     = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        chunk_size = options['chunk_size']
+        checkpoint = options['checkpoint'] or os.path.abspath(path)
+        done       = self.read_checkpoint(checkpoint) if options['resume'] else 0
+
+        self.categories = self.unambiguous('category names', ProductCategory.objects.alive().values_list('name', 'id'))
+        self.statuses   = dict(OrderStatus.objects.alive().values_list('name', 'id'))
+        self.uploaders  = dict(User.objects.alive().values_list('nickname', 'id').iterator())
+        self.addresses  = self.unambiguous('address codes', (
+            (code, (id, latitude, longitude)) for code, id, latitude, longitude in Address.objects.alive() \
+                .values_list('code', 'id', 'latitude', 'longitude').iterator()
+        ))
+
+        started  = time.monotonic()
+        imported = skipped = 0
+        chunk    = []
+        with open(path, newline='', encoding='utf-8') as file:
+            for line, row in enumerate(self.read_rows(file, format), 1):
+                if line <= done:
+                    continue
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    created, rejected = self.import_chunk(chunk, checkpoint, line)
+                    imported += created
+                    skipped  += rejected
+                    chunk     = []
+                    self.report(imported, skipped, started)
+            if chunk:
+                created, rejected = self.import_chunk(chunk, checkpoint, line)
+                imported += created
+                skipped  += rejected
+
+        self.report(imported, skipped, started)
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} products, skipped {skipped} rows'))
+
+    def unambiguous(self, label, pairs):
+        """Maps each key to its value, leaving out (and reporting) keys that several rows share."""
+        lookup    = {}
+        ambiguous = set()
+        for key, value in pairs:
+            if key in lookup:
+                ambiguous.add(key)
+            lookup[key] = value
+        for key in ambiguous:
+            del lookup[key]
+        if ambiguous:
+            self.stderr.write(f'{label} shared by several rows, their rows are skipped: {sorted(ambiguous)}')
+        return lookup
+
+    def read_rows(self, file, format):
+        if format == 'csv':
+            for row in csv.DictReader(file):
+                row['images'] = [url for url in (row.get('images') or '').split('|') if url]
+                yield row
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def build_product(self, row):
+        try:
+            address_id, latitude, longitude = self.addresses[int(row['address_code'])]
+            product = Product(
+                name                = row['name'],
+                price               = Decimal(str(row['price'])),
+                product_category_id = self.categories[row['category']],
+                uploader_id         = self.uploaders[row['uploader']],
+                address_id          = address_id,
+                description         = row.get('description') or '',
+                access_range        = int(row['access_range']) if row.get('access_range') else None,
+                order_status_id     = self.statuses.get(row.get('order_status')),
+            )
+        except (KeyError, ValueError, TypeError, InvalidOperation):
+            return None
+        return product, (latitude, longitude), row.get('images') or []
+
+    def import_chunk(self, rows, checkpoint, line):
+        """Imports rows and records line as done in one transaction, so a resume neither repeats nor skips them."""
+        built = [built for built in map(self.build_product, rows) if built]
+
+        with transaction.atomic():
+            products = self.insert_products([product for product, _, _ in built])
+
+            ProductImage.objects.bulk_create([
+                ProductImage(product_id=product.id, image_url=url)
+                for product, (_, _, images) in zip(products, built) for url in images
+            ], batch_size=5000)
+            ProductCoverage.objects.bulk_create([
+                ProductCoverage(product_id=product.id, cell=cell, created_at=product.created_at)
+                for product, (_, location, _) in zip(products, built)
+                for cell in covering_cells(*location, product.access_range)
+            ], batch_size=5000)
+            SearchPosting.objects.bulk_create([
+                posting for product in products for posting in postings_for(product)
+            ], batch_size=5000)
+            ImportCheckpoint.objects.update_or_create(source=checkpoint, defaults={'line' : line})
+
+        return len(built), len(rows) - len(built)
+
+    def insert_products(self, products):
+        """
+        bulk_create, then recovers primary keys on backends that do not return them by
+        matching the rows inserted after the previous maximum id back to this chunk.
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Product.objects.bulk_create(products)
+
+        last_id = Product.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        Product.objects.bulk_create(products)
+
+        pending = defaultdict(deque)
+        for product in products:
+            pending[(product.uploader_id, product.name, product.price)].append(product)
+        for id, uploader_id, name, price in Product.objects.filter(
+            id__gt          = last_id,
+            uploader_id__in = {product.uploader_id for product in products}
+        ).order_by('id').values_list('id', 'uploader_id', 'name', 'price'):
+            queue = pending.get((uploader_id, name, price))
+            if queue:
+                queue.popleft().id = id
+
+        if any(product.id is None for product in products):
+            raise CommandError('could not recover ids of inserted products, chunk rolled back')
+        return products
+
+    def read_checkpoint(self, checkpoint):
+        return ImportCheckpoint.objects.filter(source=checkpoint).values_list('line', flat=True).first() or 0
+
+    def report(self, imported, skipped, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(f'{imported} imported, {skipped} skipped, {imported / elapsed:,.0f} products/s')
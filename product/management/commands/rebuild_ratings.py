@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+from django.db.models            import Count, Sum
+
+from user.models    import Review
+from product.models import ProductRating
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-product review rating summary from the reviews table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        totals     = Review.objects.filter(
+            deleted_at__isnull = True,
+            product__isnull    = False
+        ).values('product_id').annotate(review_count=Count('id'), rating_sum=Sum('star_rating')).order_by('product_id')
+
+        with transaction.atomic():
+            ProductRating.objects.update(review_count=0, rating_sum=0, average=0)
+
+            rebuilt = 0
+            chunk   = []
+            for row in totals.iterator(chunk_size=chunk_size):
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    rebuilt += self.write_chunk(chunk)
+                    chunk    = []
+            if chunk:
+                rebuilt += self.write_chunk(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating summary for {rebuilt} products'))
+
+    def write_chunk(self, rows):
+        existing = ProductRating.objects.in_bulk([row['product_id'] for row in rows])
+        created  = []
+        updated  = []
+        for row in rows:
+            rating = existing.get(row['product_id']) or ProductRating(product_id=row['product_id'])
+            rating.set_totals(row['review_count'], row['rating_sum'])
+            (updated if rating.product_id in existing else created).append(rating)
+
+        ProductRating.objects.bulk_create(created)
+        ProductRating.objects.bulk_update(updated, ['review_count', 'rating_sum', 'average'])
+        return len(rows)
@@ -0,0 +1,152 @@
+from random   import Random
+from decimal  import Decimal
+from datetime import timedelta
+
+from django.core.management      import call_command
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+from django.utils                import timezone
+
+from user.models    import (
+    User,
+    Address,
+    FullAddress,
+    Wishlist,
+    Review,
+    OrderStatus,
+    MannerTemperatureCategory
+)
+from product.geo    import covering_cells
+from product.models import Product, ProductImage, ProductCoverage, MainCategory, ProductCategory
+from nearby.models  import Nearby, NearbyImage, NearbyComment, NearbyCategory
+
+MAIN_CATEGORIES  = ['디지털/가전', '가구/인테리어', '생활/가공식품', '스포츠/레저', '의류/잡화']
+ORDER_STATUSES   = [OrderStatus.ON_SALE, OrderStatus.RESERVED, OrderStatus.SOLD]
+MANNER_POINTS    = [('친절해요', '0.10'), ('시간 약속을 잘 지켜요', '0.20'), ('응답이 빨라요', '0.10'), ('불친절해요', '-0.20')]
+PRODUCT_WORDS    = ['아이폰', '갤럭시', '맥북', '자전거', '캠핑의자', '책상', '소파', '유모차', '운동화', '패딩', '전기포트', '모니터']
+NEARBY_WORDS     = ['맛집', '분실물', '동네소식', '같이 산책해요', '운동 모임', '추천해주세요']
+SEOUL_LATITUDE   = (37.45, 37.65)
+SEOUL_LONGITUDE  = (126.85, 127.15)
+BATCH_SIZE       = 1000
+
+class Command(BaseCommand):
+    help = 'Seed a deterministic synthetic marketplace for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='1 = 100 users, 1,000 products, 500 nearby posts')
+        parser.add_argument('--seed', type=int, default=2021)
+
+    def handle(self, *args, **options):
+        scale  = options['scale']
+        rng    = Random(options['seed'])
+
+        with transaction.atomic():
+            main_categories    = self.create(MainCategory, [MainCategory(name=name) for name in MAIN_CATEGORIES])
+            product_categories = self.create(ProductCategory, [
+                ProductCategory(name=f'{main.name} {index}', main_category=main)
+                for main in main_categories for index in range(1, 5)
+            ])
+            nearby_categories  = self.create(NearbyCategory, [
+                NearbyCategory(name=f'{main.name} 이야기', main_category=main) for main in main_categories
+            ])
+            order_statuses     = self.create(OrderStatus, [OrderStatus(name=name) for name in ORDER_STATUSES])
+            self.create(MannerTemperatureCategory, [
+                MannerTemperatureCategory(name=name, point=Decimal(point)) for name, point in MANNER_POINTS
+            ])
+
+            addresses = self.create(Address, [Address(
+                address   = f'서울 {index}동',
+                code      = 11000 + index,
+                latitude  = Decimal(str(round(rng.uniform(*SEOUL_LATITUDE), 6))),
+                longitude = Decimal(str(round(rng.uniform(*SEOUL_LONGITUDE), 6))),
+            ) for index in range(20 * scale)])
+
+            offset = User.objects.count()
+            users  = self.create(User, [User(
+                phone_number = f'+8210{offset + index:08d}',
+                nickname     = f'kiwi{offset + index}',
+                email        = f'kiwi{offset + index}@kiwimarket.com',
+            ) for index in range(100 * scale)])
+            self.create(FullAddress, [FullAddress(user=user, full_address=rng.choice(addresses)) for user in users])
+
+            now      = timezone.now()
+            products = self.create(Product, [Product(
+                name             = f'{rng.choice(PRODUCT_WORDS)} 팝니다 {index}',
+                price            = Decimal(rng.randrange(1, 1000) * 100),
+                product_category = rng.choice(product_categories),
+                uploader         = rng.choice(users),
+                viewed           = rng.randrange(0, 500),
+                address          = rng.choice(addresses),
+                description      = ' '.join(rng.choices(PRODUCT_WORDS, k=12)),
+                access_range     = rng.choice([1, 3, 5]),
+                order_status     = rng.choice(order_statuses),
+            ) for index in range(1000 * scale)])
+            Product.objects.bulk_update(
+                [self.backdate(product, now, rng) for product in products],
+                ['created_at'],
+                batch_size = BATCH_SIZE
+            )
+            self.create(ProductImage, [
+                ProductImage(product=product, image_url=f'https://images.kiwimarket.com/products/{product.id}/{index}.jpg')
+                for product in products for index in range(rng.randint(1, 4))
+            ])
+            locations = {address.id : address for address in addresses}
+            self.create(ProductCoverage, [
+                ProductCoverage(product=product, cell=cell, created_at=product.created_at)
+                for product in products
+                for cell in covering_cells(
+                    locations[product.address_id].latitude,
+                    locations[product.address_id].longitude,
+                    product.access_range
+                )
+            ])
+
+            self.create(Review, [Review(
+                uploader    = rng.choice(users),
+                product     = product,
+                description = '좋은 거래였어요',
+                star_rating = rng.randint(1, 5),
+            ) for product in products for _ in range(rng.randint(0, 3))])
+            self.create(Wishlist, [
+                Wishlist(user=user, product=product, is_liked=True)
+                for user in users for product in rng.sample(products, 5)
+            ])
+
+            nearbys = self.create(Nearby, [Nearby(
+                name            = f'{rng.choice(NEARBY_WORDS)} {index}',
+                price           = Decimal(0),
+                nearby_category = rng.choice(nearby_categories),
+                uploader        = rng.choice(users),
+                viewed          = rng.randrange(0, 500),
+                address         = rng.choice(addresses),
+                description     = ' '.join(rng.choices(NEARBY_WORDS, k=8)),
+            ) for index in range(500 * scale)])
+            self.create(NearbyImage, [
+                NearbyImage(nearby=nearby, image_url=f'https://images.kiwimarket.com/nearbys/{nearby.id}/0.jpg')
+                for nearby in nearbys if rng.random() < 0.5
+            ])
+            self.create(NearbyComment, [
+                NearbyComment(nearby=nearby, user=rng.choice(users), content='저도 궁금해요')
+                for nearby in nearbys for _ in range(rng.randint(0, 5))
+            ])
+
+        # bulk_create skips the signals that keep these in sync, so rebuild them in bulk
+        call_command('rebuild_ratings', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('reconcile_like_counts', stdout=self.stdout)
+        call_command('recompute_comment_counts', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(products)} products and {len(nearbys)} nearby posts'
+        ))
+
+    def create(self, model, rows):
+        """bulk_create that also works on backends which do not return primary keys."""
+        created = model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        if created and created[0].pk is None:
+            created = list(model.objects.order_by('-id')[:len(rows)])[::-1]
+        return created
+
+    def backdate(self, product, now, rng):
+        product.created_at = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 90))
+        return product
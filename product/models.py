@@ -1,46 +1,135 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db        import models, transaction
+from django.db.models import Count, Sum
+
+from kiwimarket.softdelete import SoftDeleteModel
+
+from .geo import covering_cells
 
 #from user.models    import User, Address, OrderStatus
 
-class Product(models.Model):
+class Product(SoftDeleteModel):
     name             = models.CharField(max_length=100)
     price            = models.DecimalField(max_digits= 7, decimal_places=2)
     product_category = models.ForeignKey('ProductCategory', on_delete = models.SET_NULL, null=True)
     uploader         = models.ForeignKey('user.User', on_delete = models.SET_NULL, null=True)
-    viewed           = models.IntegerField(null=True)
+    viewed           = models.IntegerField(default=0)
+    like_count       = models.IntegerField(default=0)
     address          = models.ForeignKey('user.Address', on_delete = models.SET_NULL, null=True)
     description      = models.CharField(max_length=2000)
     access_range     = models.IntegerField(null=True)
     order_status     = models.ForeignKey('user.OrderStatus', on_delete = models.SET_NULL, null=True)
     created_at       = models.DateTimeField(auto_now_add = True) 
     updated_at       = models.DateTimeField(auto_now = True)
-    deleted_at       = models.DateTimeField(null = True) 
+
+    soft_delete_cascade = ('productimage_set',)
 
     class Meta:
         db_table = 'products'
+        indexes  = [
+            models.Index(fields=['deleted_at', 'created_at', 'id'], name='products_created_id_idx'),
+            models.Index(fields=['deleted_at', 'price', 'id'], name='products_price_id_idx'),
+            models.Index(fields=['deleted_at', 'viewed', 'id'], name='products_viewed_id_idx'),
+            models.Index(fields=['product_category', 'deleted_at', 'created_at', 'id'], name='products_category_created_idx'),
+            models.Index(fields=['address', 'deleted_at'], name='products_address_idx'),
+        ]
+
+    def refresh_coverage(self):
+        cells = []
+        if self.deleted_at is None and self.address_id:
+            address  = self._meta.get_field('address').related_model
+            location = address.objects.filter(id=self.address_id).values('latitude', 'longitude').first()
+            if location:
+                cells = covering_cells(location['latitude'], location['longitude'], self.access_range)
+
+        with transaction.atomic():
+            ProductCoverage.objects.filter(product_id=self.id).delete()
+            ProductCoverage.objects.bulk_create([
+                ProductCoverage(product_id=self.id, cell=cell, created_at=self.created_at) for cell in cells
+            ])
+
+class ProductCoverage(models.Model):
+    # rows exist only for live products and carry the product's created_at,
+    # so a cell's feed is a range scan over productcoverages_feed_idx
+    product    = models.ForeignKey('Product', on_delete = models.CASCADE, related_name='coverages')
+    cell       = models.IntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table        = 'productcoverages'
+        unique_together = ('cell', 'product')
+        indexes         = [
+            models.Index(fields=['cell', 'created_at', 'product'], name='productcoverages_feed_idx'),
+        ]
 
-class ProductImage(models.Model):
+class ProductRating(models.Model):
+    product      = models.OneToOneField('Product', on_delete = models.CASCADE, primary_key=True, related_name='rating')
+    review_count = models.IntegerField(default=0)
+    rating_sum   = models.IntegerField(default=0)
+    average      = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    updated_at   = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        db_table = 'productratings'
+
+    def set_totals(self, review_count, rating_sum):
+        self.review_count = review_count
+        self.rating_sum   = rating_sum
+        self.average      = round(Decimal(rating_sum) / review_count, 2) if review_count else Decimal(0)
+
+    @classmethod
+    def recompute(cls, product_ids):
+        from user.models import Review
+
+        totals = {
+            row['product_id'] : row
+            for row in Review.objects.alive().filter(product_id__in=product_ids)
+                .values('product_id').annotate(review_count=Count('id'), rating_sum=Sum('star_rating')).order_by()
+        }
+        with transaction.atomic():
+            for product_id in product_ids:
+                rating, _ = cls.objects.select_for_update().get_or_create(product_id=product_id)
+                row       = totals.get(product_id, {'review_count' : 0, 'rating_sum' : 0})
+                rating.set_totals(row['review_count'], row['rating_sum'])
+                rating.save()
+
+    @classmethod
+    def adjust(cls, product_id, review_count, rating_sum):
+        with transaction.atomic():
+            rating, _ = cls.objects.select_for_update().get_or_create(product_id=product_id)
+            rating.set_totals(rating.review_count + review_count, rating.rating_sum + rating_sum)
+            rating.save()
+
+class ProductImage(SoftDeleteModel):
     product    = models.ForeignKey('Product', on_delete = models.SET_NULL, null=True)
     image_url  = models.URLField(max_length = 2000, null=True)
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'productimages'
+        indexes  = [
+            models.Index(fields=['product', 'deleted_at'], name='productimages_product_idx'),
+        ]
 
-class MainCategory(models.Model):
+class MainCategory(SoftDeleteModel):
     name       = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'maincategories'
 
-class ProductCategory(models.Model):
+class ProductCategory(SoftDeleteModel):
     name          = models.CharField(max_length=100)
     main_category = models.ForeignKey('MainCategory', on_delete = models.SET_NULL, null=True)
     created_at    = models.DateTimeField(auto_now_add = True) 
-    deleted_at    = models.DateTimeField(null = True) 
 
     class Meta:
-        db_table = 'productcategories'
\ No newline at end of file
+        db_table = 'productcategories'
+class ImportCheckpoint(models.Model):
+    source     = models.CharField(max_length=500, unique=True)
+    line       = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        db_table = 'importcheckpoints'
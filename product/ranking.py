@@ -0,0 +1,132 @@
+import time
+
+from datetime import timedelta
+
+import numpy as np
+
+from django.core.cache import cache
+from django.utils      import timezone
+
+from user.models import FullAddress, Address, WishCategory, Wishlist
+
+from .categories import category_tree
+from .geo        import cell_of, access_range_of, KM_PER_DEGREE
+from .models     import Product
+
+CANDIDATE_POOL    = 1000
+CANDIDATE_DAYS    = 30
+CACHED_CANDIDATES = 200
+REFRESH_SECONDS   = 300
+CACHE_SECONDS     = 60 * 60 * 24
+RECENCY_HALF_LIFE = 48
+WISH_WEIGHT       = 0.5
+WEIGHTS           = np.array([0.4, 0.25, 0.2, 0.15])  # affinity, recency, popularity, distance
+CACHE_KEY         = 'home_feed:{}'
+
+def invalidate(user_id):
+    cache.delete(CACHE_KEY.format(user_id))
+
+def affinity_vector(user_id, categories):
+    """
+    Interest per product category for one user: liked wish categories count 1 each and
+    every wishlisted product adds WISH_WEIGHT to its category. L2-normalized, so users
+    with long wishlists do not outweigh the other signals.
+    """
+    positions = {category_id : index for index, category_id in enumerate(categories.product_categories)}
+    vector    = np.zeros(len(positions) + 1)
+
+    for category_id in WishCategory.objects.alive().filter(user_id=user_id, is_liked=True).values_list('product_category_id', flat=True):
+        vector[positions.get(category_id, -1)] += 1
+    for category_id in Wishlist.objects.alive().filter(user_id=user_id, is_liked=True).values_list('product__product_category_id', flat=True):
+        vector[positions.get(category_id, -1)] += WISH_WEIGHT
+
+    vector[-1] = 0
+    norm       = np.linalg.norm(vector)
+    return (vector / norm if norm else vector), positions
+
+def candidate_rows(location, ids=None, after_id=None):
+    coverage = {'coverages__cell' : cell_of(location['latitude'], location['longitude'])}
+    if ids is None:
+        coverage['coverages__created_at__gte'] = timezone.now() - timedelta(days=CANDIDATE_DAYS)
+
+    products = Product.objects.alive().filter(**coverage)
+    if ids is not None:
+        products = products.filter(id__in=ids)
+    elif after_id:
+        products = products.filter(id__gt=after_id)
+
+    return list(products.order_by('-created_at', '-id').values_list(
+        'id',
+        'product_category_id',
+        'created_at',
+        'viewed',
+        'like_count',
+        'access_range',
+        'address__latitude',
+        'address__longitude',
+    )[:CANDIDATE_POOL])
+
+def score(rows, affinity, positions, location):
+    """Scores every candidate row in one vectorized pass and returns (ids, scores)."""
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([])
+
+    ids, category_ids, created_at, viewed, like_count, access_range, latitude, longitude = zip(*rows)
+    now = timezone.now()
+
+    category_index = np.array([positions.get(category_id, -1) for category_id in category_ids])
+    age_hours      = np.array([(now - created).total_seconds() / 3600 for created in created_at])
+    popularity     = np.log1p(np.array(viewed, dtype=float) + 3 * np.array(like_count, dtype=float))
+    reach          = np.array([access_range_of(value) for value in access_range], dtype=float)
+
+    latitude  = np.array(latitude, dtype=float)
+    longitude = np.array(longitude, dtype=float)
+    origin    = float(location['latitude']), float(location['longitude'])
+    distance  = KM_PER_DEGREE * np.hypot(latitude - origin[0], (longitude - origin[1]) * np.cos(np.radians(origin[0])))
+
+    features = np.column_stack([
+        affinity[category_index],
+        np.exp2(-age_hours / RECENCY_HALF_LIFE),
+        popularity / popularity.max() if popularity.max() else popularity,
+        np.clip(1 - distance / reach, 0, 1),
+    ])
+    return np.array(ids, dtype=np.int64), features @ WEIGHTS
+
+def top(ids, scores, limit=CACHED_CANDIDATES):
+    order = np.argsort(-scores, kind='stable')[:limit]
+    return ids[order].tolist(), scores[order].tolist()
+
+def home_candidates(user):
+    """
+    Ranked product ids for the user's home feed. The ranked list is cached per user;
+    once it is older than REFRESH_SECONDS only the cached candidates and products
+    posted since are rescored, instead of the whole neighborhood.
+    """
+    address_id = FullAddress.objects.alive().filter(user=user).order_by('-created_at').values_list('full_address_id', flat=True).first()
+    location   = Address.objects.alive().filter(id=address_id).values('latitude', 'longitude').first() if address_id else None
+    if not location:
+        return []
+
+    key    = CACHE_KEY.format(user.id)
+    cached = cache.get(key)
+    if cached and cached['address_id'] == address_id and time.time() - cached['refreshed_at'] < REFRESH_SECONDS:
+        return cached['ids']
+
+    categories          = category_tree.get()
+    affinity, positions = affinity_vector(user.id, categories)
+
+    if cached and cached['address_id'] == address_id:
+        rows = candidate_rows(location, ids=cached['ids']) + candidate_rows(location, after_id=cached['last_id'])
+    else:
+        rows = candidate_rows(location)
+
+    ids, scores = top(*score(rows, affinity, positions, location))
+    last_id     = max([row[0] for row in rows] + [cached['last_id'] if cached else 0])
+
+    cache.set(key, {
+        'ids'          : ids,
+        'address_id'   : address_id,
+        'last_id'      : last_id,
+        'refreshed_at' : time.time(),
+    }, CACHE_SECONDS)
+    return ids
@@ -0,0 +1,82 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from kiwimarket.counters  import view_counter
+from kiwimarket.streaming import chunked
+
+from .categories import category_tree
+from .models     import Product, ProductImage, ProductRating
+
+def image_prefetch():
+    return Prefetch(
+        'productimage_set',
+        queryset = ProductImage.objects.alive().order_by('id'),
+        to_attr  = 'images'
+    )
+
+def feed_queryset(queryset=None):
+    """
+    Product rows with their uploader, address, rating summary and live images attached.
+    Category names come from the in-memory category tree.
+    Costs two queries however many products are fetched.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+
+    return queryset.select_related(
+        'uploader',
+        'address',
+        'rating',
+    ).prefetch_related(image_prefetch())
+
+def rating_of(product):
+    try:
+        return product.rating
+    except ProductRating.DoesNotExist:
+        return None
+
+def serialize_product(product, categories=None):
+    categories = categories or category_tree.get()
+    category   = categories.product_categories.get(product.product_category_id)
+    uploader   = product.uploader
+    address    = product.address
+    rating     = rating_of(product)
+
+    return {
+        "id"               : product.id,
+        "name"             : product.name,
+        "price"            : int(product.price),
+        "description"      : product.description,
+        "category_id"      : product.product_category_id,
+        "category"         : category.name if category else None,
+        "main_category_id" : category.main_category_id if category else None,
+        "uploader"         : {
+            "id"              : uploader.id,
+            "nickname"        : uploader.nickname,
+            "profile_picture" : uploader.profile_picture,
+            "manner_score"    : float(uploader.manner_score),
+            "follower_count"  : uploader.follower_count,
+        } if uploader else None,
+        "address"          : address.address if address else None,
+        "viewed"           : view_counter.merged(product),
+        "like_count"       : product.like_count,
+        "star_rating"      : float(round(rating.average, 1)) if rating and rating.review_count else None,
+        "review_count"     : rating.review_count if rating else 0,
+        "image_url"        : [image.image_url for image in product.images],
+        "created_at"       : product.created_at,
+    }
+
+def serialize_products(queryset):
+    categories = category_tree.get()
+    return [serialize_product(product, categories) for product in feed_queryset(queryset)]
+
+def iter_serialized(queryset, chunk_size=1000):
+    """
+    Serializes a large queryset chunk by chunk over a server-side cursor.
+    iterator() skips prefetch_related, so images are fetched per chunk instead.
+    """
+    categories = category_tree.get()
+    rows       = feed_queryset(queryset).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        prefetch_related_objects(chunk, image_prefetch())
+        for product in chunk:
+            yield serialize_product(product, categories)
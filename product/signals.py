@@ -0,0 +1,94 @@
+from django.db                import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch          import receiver
+
+from kiwimarket.softdelete import soft_deleted
+from nearby.models         import NearbyCategory
+from user.models           import Address, Review, WishCategory, Wishlist
+
+from .categories import category_tree
+from .ranking    import invalidate as invalidate_home_feed
+from .models     import Product, ProductCoverage, ProductRating, MainCategory, ProductCategory
+
+COVERAGE_FIELDS = {'address', 'access_range', 'deleted_at', 'created_at'}
+
+@receiver(post_save, sender=Product)
+def refresh_product_coverage(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not COVERAGE_FIELDS.intersection(update_fields):
+        return
+    instance.refresh_coverage()
+
+@receiver(soft_deleted, sender=Product)
+def remove_product_coverage(sender, pks, **kwargs):
+    ProductCoverage.objects.filter(product_id__in=pks).delete()
+
+@receiver(post_save, sender=Address)
+def refresh_address_coverage(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    for product in Product.objects.filter(address_id=instance.id).only('id', 'address_id', 'access_range', 'deleted_at', 'created_at'):
+        product.refresh_coverage()
+
+def review_contribution(product_id, star_rating, deleted_at):
+    if product_id is None or deleted_at is not None:
+        return None
+    return product_id, star_rating
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Review.objects.filter(pk=instance.pk).values('product_id', 'star_rating', 'deleted_at').first()
+    instance._previous_rating = review_contribution(**previous) if previous else None
+
+@receiver(post_save, sender=Review)
+def update_product_rating(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    current  = review_contribution(instance.product_id, instance.star_rating, instance.deleted_at)
+    if previous == current:
+        return
+
+    if previous:
+        ProductRating.adjust(previous[0], -1, -previous[1])
+    if current:
+        ProductRating.adjust(current[0], 1, current[1])
+
+@receiver(soft_deleted, sender=Review)
+def recompute_product_rating(sender, pks, **kwargs):
+    product_ids = set(Review.objects.filter(pk__in=pks, product__isnull=False).values_list('product_id', flat=True))
+    ProductRating.recompute(sorted(product_ids))
+
+@receiver(post_delete, sender=Review)
+def remove_product_rating(sender, instance, **kwargs):
+    current = review_contribution(instance.product_id, instance.star_rating, instance.deleted_at)
+    if current:
+        ProductRating.adjust(current[0], -1, -current[1])
+
+@receiver(post_save, sender=MainCategory)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=NearbyCategory)
+@receiver(post_delete, sender=MainCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=NearbyCategory)
+def bump_category_tree(sender, **kwargs):
+    transaction.on_commit(category_tree.bump)
+
+@receiver(soft_deleted, sender=MainCategory)
+@receiver(soft_deleted, sender=ProductCategory)
+@receiver(soft_deleted, sender=NearbyCategory)
+def bump_deleted_categories(sender, pks, **kwargs):
+    transaction.on_commit(category_tree.bump)
+
+@receiver(post_save, sender=WishCategory)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=WishCategory)
+@receiver(post_delete, sender=Wishlist)
+def reset_home_feed(sender, instance, **kwargs):
+    if instance.user_id:
+        invalidate_home_feed(instance.user_id)
+
+@receiver(soft_deleted, sender=WishCategory)
+@receiver(soft_deleted, sender=Wishlist)
+def reset_deleted_home_feeds(sender, pks, **kwargs):
+    for user_id in set(sender.objects.filter(pk__in=pks, user__isnull=False).values_list('user_id', flat=True)):
+        invalidate_home_feed(user_id)
@@ -1,3 +1,338 @@
-from django.test import TestCase
+import io, json, jwt, math, random, tempfile
 
-# Create your tests here.
+from datetime      import timedelta
+from decimal       import Decimal
+from unittest.mock import patch
+
+from django.core.cache      import cache
+from django.core.management import call_command
+from django.db              import connection
+from django.test            import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils      import CaptureQueriesContext
+
+from my_settings  import SECRET_KEY, ALGORITHM
+from search.index import postings_for
+from user.models  import User, Address, FullAddress, Review, WishCategory
+
+from .categories import category_tree
+from .geo        import KM_PER_DEGREE, cell_of, covering_cells, haversine
+from .models     import Product, ProductImage, ProductCoverage, ProductRating, MainCategory, ProductCategory, ImportCheckpoint
+
+class CategoryTreeTest(TransactionTestCase):
+    # category changes bump the tree in transaction.on_commit, so these tests commit
+    def setUp(self):
+        cache.clear()
+        category_tree.snapshot = None
+        self.main     = MainCategory.objects.create(name='디지털/가전')
+        self.category = ProductCategory.objects.create(name='휴대폰', main_category=self.main)
+
+    def test_save_reloads_tree(self):
+        self.assertIn(self.category.id, category_tree.get().product_categories)
+
+        ProductCategory.objects.create(name='태블릿', main_category=self.main)
+
+        self.assertEqual(len(category_tree.get().product_categories), 2)
+
+    def test_bulk_soft_delete_reloads_tree(self):
+        self.assertIn(self.category.id, category_tree.get().product_categories)
+
+        ProductCategory.objects.filter(id=self.category.id).soft_delete()
+
+        self.assertNotIn(self.category.id, category_tree.get().product_categories)
+
+    def test_snapshot_expires_after_ttl(self):
+        snapshot = category_tree.get()
+        snapshot.loaded_at -= category_tree.ttl
+
+        self.assertIsNot(category_tree.get(), snapshot)
+
+    def test_unchanged_tree_answers_not_modified(self):
+        etag = self.client.get('/product/category')['ETag']
+
+        response = self.client.get('/product/category', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+class ExportAccessTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def token(self, **fields):
+        user = User.objects.create(phone_number='+821000000001', nickname='user', email='user@kiwimarket.com', **fields)
+        return jwt.encode({'user_id' : user.id}, SECRET_KEY, algorithm=ALGORITHM)
+
+    def test_exports_are_refused_to_regular_users(self):
+        token = self.token()
+        for url in ('/product/export', '/nearby/export'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=token).status_code, 403)
+
+    def test_exports_stream_for_staff(self):
+        token = self.token(is_staff=True)
+        for url in ('/product/export', '/nearby/export'):
+            response = self.client.get(url, HTTP_AUTHORIZATION=token)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+
+class ImportProductsTest(TestCase):
+    def setUp(self):
+        ProductCategory.objects.create(name='휴대폰')
+        User.objects.create(phone_number='+821000000001', nickname='seller', email='seller@kiwimarket.com')
+        Address.objects.create(address='역삼동', code=1, latitude=37.5, longitude=127.0)
+        self.file = tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8')
+        self.addCleanup(self.file.close)
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def row(self, name, address_code=1, category='휴대폰'):
+        return {"name" : name, "price" : 1000, "category" : category, "address_code" : address_code, "uploader" : 'seller'}
+
+    def run_import(self, *args):
+        call_command('import_products', self.file.name, '--chunk-size', '2', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_resume_after_failed_chunk_imports_every_row_once(self):
+        self.write([self.row(f'product {index}') for index in range(5)])
+
+        def failing_postings(product):
+            if product.name == 'product 3':
+                raise RuntimeError('crash')
+            return postings_for(product)
+
+        with patch('product.management.commands.import_products.postings_for', failing_postings):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(ImportCheckpoint.objects.get().line, 2)
+
+        self.run_import('--resume')
+
+        names = sorted(Product.objects.values_list('name', flat=True))
+        self.assertEqual(names, [f'product {index}' for index in range(5)])
+        self.assertEqual(ImportCheckpoint.objects.get().line, 5)
+
+    def test_rows_with_ambiguous_address_code_are_skipped(self):
+        Address.objects.create(address='삼성동', code=2, latitude=37.5, longitude=127.0)
+        Address.objects.create(address='대치동', code=2, latitude=37.5, longitude=127.0)
+        self.write([self.row('unique'), self.row('ambiguous', address_code=2)])
+
+        self.run_import()
+
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['unique'])
+
+    def test_rows_with_ambiguous_category_name_are_skipped(self):
+        ProductCategory.objects.create(name='기타')
+        ProductCategory.objects.create(name='기타')
+        self.write([self.row('unique'), self.row('ambiguous', category='기타')])
+
+        self.run_import()
+
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['unique'])
+
+class ProductQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(name='휴대폰')
+        uploader = User.objects.create(phone_number='+821000000001', nickname='seller', email='seller@kiwimarket.com')
+        address  = Address.objects.create(address='역삼동', code=1, latitude=37.5, longitude=127.0)
+        self.products = [
+            Product.objects.create(name=f'product {index}', price=1000, description='', product_category=category, uploader=uploader, address=address)
+            for index in range(45)
+        ]
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image_url=f'https://images.kiwimarket.com/{product.id}/{index}.jpg')
+            for product in self.products for index in range(3)
+        ])
+        # serializers read category names from the tree, which loads once per process
+        category_tree.snapshot = None
+        category_tree.get()
+
+    def queries_for(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        # one query for the page of products, one prefetch for their images
+        self.assertEqual(self.queries_for('/product/list/new'), 2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/product/list/all')
+        self.assertEqual(len(response.json()['result']), 40)
+
+    def test_category_tree_is_read_once_per_request(self):
+        for url in ('/product/list/all', f'/product/{self.products[0].id}', '/nearby', '/search?q=product'):
+            with patch.object(category_tree, 'get', wraps=category_tree.get) as get:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(get.call_count, 1, url)
+
+    def test_non_numeric_subcategory_is_rejected(self):
+        response = self.client.get('/product/list/new', {'subcategory' : 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'INVALID_SUBCATEGORY')
+
+    def test_detail_queries_do_not_grow_with_image_count(self):
+        few, many = self.products[0], self.products[1]
+        ProductImage.objects.bulk_create([ProductImage(product=many, image_url=f'https://images.kiwimarket.com/{index}.jpg') for index in range(20)])
+
+        self.assertEqual(self.queries_for(f'/product/{few.id}'), 2)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/product/{many.id}')
+        self.assertEqual(len(response.json()['result'][0]['images_slider']), 23)
+
+class CoveringCellsTest(SimpleTestCase):
+    def test_every_point_in_range_is_covered(self):
+        rng = random.Random(3)
+        for _ in range(50):
+            latitude, longitude, access_range = rng.uniform(33, 38), rng.uniform(126, 130), rng.choice([1, 3, 5, 10])
+            cells = set(covering_cells(latitude, longitude, access_range))
+            for _ in range(50):
+                distance, bearing = rng.uniform(0, access_range), rng.uniform(0, 2 * math.pi)
+                point_latitude    = latitude + distance * math.cos(bearing) / KM_PER_DEGREE
+                point_longitude   = longitude + distance * math.sin(bearing) / (KM_PER_DEGREE * math.cos(math.radians(latitude)))
+                if haversine(latitude, longitude, point_latitude, point_longitude) <= access_range:
+                    self.assertIn(cell_of(point_latitude, point_longitude), cells)
+
+class ProductFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.here = Address.objects.create(address='역삼동', code=1, latitude=37.5, longitude=127.0)
+        near      = Address.objects.create(address='삼성동', code=2, latitude=37.51, longitude=127.0)
+        far       = Address.objects.create(address='수원', code=3, latitude=37.3, longitude=127.0)
+        self.near = Product.objects.create(name='near', price=1000, description='', address=near, access_range=3)
+        self.far  = Product.objects.create(name='far', price=1000, description='', address=far, access_range=3)
+
+    def test_feed_lists_products_whose_range_reaches_the_address(self):
+        response = self.client.get('/product/feed', {'address' : self.here.id})
+
+        self.assertEqual([product['id'] for product in response.json()['result']], [self.near.id])
+
+    def test_non_numeric_address_is_rejected(self):
+        response = self.client.get('/product/feed', {'address' : 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'INVALID_ADDRESS')
+
+    def test_moved_address_moves_the_coverage(self):
+        self.far.address.latitude = 37.505
+        self.far.address.save()
+
+        response = self.client.get('/product/feed', {'address' : self.here.id})
+
+        self.assertEqual({product['id'] for product in response.json()['result']}, {self.near.id, self.far.id})
+
+    def test_feed_pages_newest_first_over_the_coverage_index(self):
+        newer = Product.objects.create(name='newer', price=1000, description='', address=self.near.address, access_range=3)
+        seen, params = [], {'address' : self.here.id}
+        with patch('product.views.FEED_LIMIT', 1):
+            for _ in range(3):
+                page = self.client.get('/product/feed', params).json()
+                seen.extend(product['id'] for product in page['result'])
+                if page['next_cursor'] is None:
+                    break
+                params['cursor'] = page['next_cursor']
+
+        self.assertEqual(seen, [newer.id, self.near.id])
+
+        cell = cell_of(37.5, 127.0)
+        with connection.cursor() as cursor:
+            sql, params = ProductCoverage.objects.filter(cell=cell).order_by('-created_at', '-product_id')[:41].query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('productcoverages_feed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_backdated_product_moves_in_the_feed(self):
+        newer = Product.objects.create(name='newer', price=1000, description='', address=self.near.address, access_range=3)
+        newer.created_at = self.near.created_at - timedelta(days=1)
+        newer.save(update_fields=['created_at'])
+
+        response = self.client.get('/product/feed', {'address' : self.here.id})
+
+        self.assertEqual([product['id'] for product in response.json()['result']], [self.near.id, newer.id])
+
+class ProductRatingTest(TestCase):
+    def setUp(self):
+        self.first  = Product.objects.create(name='first', price=1000, description='')
+        self.second = Product.objects.create(name='second', price=1000, description='')
+
+    def totals(self, product):
+        rating = ProductRating.objects.get(product=product)
+        return rating.review_count, rating.rating_sum, rating.average
+
+    def test_summary_follows_review_changes(self):
+        kept   = Review.objects.create(product=self.first, description='', star_rating=5)
+        edited = Review.objects.create(product=self.first, description='', star_rating=3)
+        self.assertEqual(self.totals(self.first), (2, 8, Decimal('4.00')))
+
+        edited.star_rating = 4
+        edited.save()
+        self.assertEqual(self.totals(self.first), (2, 9, Decimal('4.50')))
+
+        edited.product = self.second
+        edited.save()
+        self.assertEqual(self.totals(self.first), (1, 5, Decimal('5.00')))
+        self.assertEqual(self.totals(self.second), (1, 4, Decimal('4.00')))
+
+        Review.objects.filter(id=kept.id).soft_delete()
+        edited.delete()
+        self.assertEqual(self.totals(self.first), (0, 0, Decimal('0.00')))
+        self.assertEqual(self.totals(self.second), (0, 0, Decimal('0.00')))
+
+class AsyncProductViewTest(TransactionTestCase):
+    # the async views query on worker threads, which only see committed rows
+    def setUp(self):
+        cache.clear()
+        category_tree.snapshot = None
+        category = ProductCategory.objects.create(name='휴대폰')
+        address  = Address.objects.create(address='역삼동', code=1, latitude=37.5, longitude=127.0)
+        uploader = User.objects.create(phone_number='+821000000001', nickname='seller', email='seller@kiwimarket.com')
+        for index in range(10):
+            product = Product.objects.create(name=f'product {index}', price=1000 + index, description='', product_category=category, uploader=uploader, address=address)
+            ProductImage.objects.create(product=product, image_url=f'https://images.kiwimarket.com/{product.id}.jpg')
+        Review.objects.create(product=product, description='', star_rating=4)
+        self.product = product
+
+    def results(self, url):
+        results = self.client.get(url).json()['result']
+        for result in results:
+            # each detail request counts itself as a view
+            result.pop('viewed')
+        return results
+
+    def test_async_endpoints_answer_like_the_sync_ones(self):
+        for sync_url, async_url in (
+            ('/product/list/new?sort=price', '/product/async/list/new?sort=price'),
+            (f'/product/{self.product.id}', f'/product/async/{self.product.id}'),
+        ):
+            self.assertEqual(self.results(async_url), self.results(sync_url))
+
+    def test_async_detail_of_missing_product(self):
+        self.assertEqual(self.client.get('/product/async/0').status_code, 404)
+
+class HomeFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = ProductCategory.objects.create(name='휴대폰')
+        self.books  = ProductCategory.objects.create(name='도서')
+        address     = Address.objects.create(address='역삼동', code=1, latitude=37.5, longitude=127.0)
+        self.user   = User.objects.create(phone_number='+821000000001', nickname='buyer', email='buyer@kiwimarket.com')
+        self.token  = jwt.encode({'user_id' : self.user.id}, SECRET_KEY, algorithm=ALGORITHM)
+        FullAddress.objects.create(user=self.user, full_address=address)
+        self.phone  = Product.objects.create(name='아이폰', price=1000, description='', product_category=self.phones, address=address)
+        self.book   = Product.objects.create(name='소설', price=1000, description='', product_category=self.books, address=address)
+        category_tree.snapshot = None
+
+    def ranked(self):
+        response = self.client.get('/product/home', HTTP_AUTHORIZATION=self.token)
+        return [product['id'] for product in response.json()['result']]
+
+    def test_liked_category_ranks_first_and_changes_rerank(self):
+        wish = WishCategory.objects.create(user=self.user, product_category=self.phones, is_liked=True)
+        self.assertEqual(self.ranked(), [self.phone.id, self.book.id])
+
+        WishCategory.objects.filter(id=wish.id).soft_delete()
+        WishCategory.objects.create(user=self.user, product_category=self.books, is_liked=True)
+        self.assertEqual(self.ranked(), [self.book.id, self.phone.id])
+
+    def test_home_feed_needs_login(self):
+        self.assertEqual(self.client.get('/product/home').status_code, 401)
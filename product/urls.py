@@ -0,0 +1,25 @@
+from django.urls import path
+
+from .views import (
+    ProductListView,
+    ProductDetailView,
+    ProductFeedView,
+    ProductHomeView,
+    ProductExportView,
+    ProductLikeView,
+    CategoryView,
+    async_product_list,
+    async_product_detail
+)
+
+urlpatterns = [
+    path('/feed', ProductFeedView.as_view()),
+    path('/home', ProductHomeView.as_view()),
+    path('/category', CategoryView.as_view()),
+    path('/export', ProductExportView.as_view()),
+    path('/list/<str:type>', ProductListView.as_view()),
+    path('/<int:product_id>', ProductDetailView.as_view()),
+    path('/<int:product_id>/like', ProductLikeView.as_view()),
+    path('/async/list/<str:type>', async_product_list),
+    path('/async/<int:product_id>', async_product_detail),
+]
@@ -1,59 +1,248 @@
-import json
+import json, asyncio
 
 from django.views     import View
-from django.http      import JsonResponse
+from django.http      import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.db.models import Q
 
-from .models import (
+from kiwimarket.counters  import view_counter
+from kiwimarket.routers   import replica_reads
+from kiwimarket.streaming import StreamingJsonResponse
+from user.likes           import set_wishlist
+from user.models          import Address, FullAddress
+from utils                import login_check, keyset_paginate, run_query
+
+from .categories  import category_tree
+from .geo         import cell_of, haversine, access_range_of
+from .ranking     import home_candidates
+from .serializers import feed_queryset, serialize_product, iter_serialized
+from .models      import (
     Product,
     ProductImage,
+    ProductRating,
+    ProductCoverage,
     MainCategory,
     ProductCategory
 )
 
+FEED_LIMIT        = 40
+HOME_PAGE_SIZE    = 20
+EXPORT_CHUNK_SIZE = 1000
+PAGE_SIZES        = {
+    "new" : 8,
+    "all" : 40,
+}
+PRODUCT_SORTS     = {
+    "new"     : ('-created_at', '-id'),
+    "old"     : ('created_at', 'id'),
+    "price"   : ('price', 'id'),
+    "-price"  : ('-price', '-id'),
+    "popular" : ('-viewed', '-id'),
+}
+FEED_SORT         = ('-created_at', '-product_id')
+
+def list_products(type, params):
+    """Returns (products, next_cursor) for a list request; raises ValueError with the error message."""
+    category_seq    = params.get('category', None)
+    subcategory_seq = params.get('subcategory', None)
+    sort            = params.get('sort', 'new')
+
+    if category_seq and not category_seq.isdigit():
+        raise ValueError('INVALID_CATEGORY')
+    if subcategory_seq and not subcategory_seq.isdigit():
+        raise ValueError('INVALID_SUBCATEGORY')
+    if type not in PAGE_SIZES:
+        raise ValueError('INVALID_TYPE')
+    if sort not in PRODUCT_SORTS:
+        raise ValueError('INVALID_SORT')
+
+    q = Q()
+    if category_seq:
+        q &= Q(product_category_id__in=category_tree.get().product_children.get(int(category_seq), ()))
+    if subcategory_seq:
+        q &= Q(product_category_id=subcategory_seq)
+
+    return keyset_paginate(
+        feed_queryset(Product.objects.alive().filter(q)),
+        PRODUCT_SORTS[sort],
+        cursor = params.get('cursor', None),
+        limit  = PAGE_SIZES[type]
+    )
+
 class ProductListView(View):
+    @replica_reads
     def get(self, request, type):
-            category_seq    = request.GET.get('category', None)
-            subcategory_seq = request.GET.get('subcategory', None)
-            sort            = request.GET.get('sort', None)
-
-            if type == "new":
-                products = Product.objects.filter(Q(category=category_seq) | Q (subcategory=subcategory_seq), id__range=(1,8)).order_by(sort).values()
-            elif type == "all":
-                products = Product.objects.filter(Q(category=category_seq) | Q (subcategory=subcategory_seq), id__range=(1,40)).order_by(sort).values()
-
-            filtered_products = [{
-                "id"            : item["id"],
-                "name"          : item["name"],
-                "price"         : int(item["price"]),
-                "star_rating"   : item["star_rating"],
-                "description"   : item["description"],
-                "category_id"   : item["category_id"],
-                "subcategory_id": item["subcategory_id"],
-                "discount_id"   : item["discount_id"],
-                "image_url"     : list(ProductImage.objects.filter(product_id = item["id"]).values_list('image_url', flat=True)),
-                "created_at"    : item["created_at"],
-            }for item in products]
-
-            return JsonResponse({"message" : "SUCCESS", "result" : filtered_products}, status = 200)
+            try:
+                products, next_cursor = list_products(type, request.GET)
+            except ValueError as error:
+                return JsonResponse({"message" : str(error)}, status=400)
+
+            categories = category_tree.get()
+            return JsonResponse({
+                "message"     : "SUCCESS",
+                "result"      : [serialize_product(product, categories) for product in products],
+                "next_cursor" : next_cursor,
+            }, status = 200)
             
 class ProductDetailView(View):
+    @replica_reads
     def get(self, request, product_id):
-            if Product.objects.filter(id=product_id).exists():
-                products =  Product.objects.filter(id=product_id).values()
-                average_star_rating = Review.objects.filter(product_id=product_id).aggregate(Avg('star_rating'))["star_rating__avg"]
-                result = [{
-                    "id"            : item["id"],
-                    "name"          : item["name"],
-                    "price"         : int(item["price"]),
-                    "star_rating"   : round(average_star_rating, 1),
-                    "description"   : item["description"],
-                    "category_id"   : item["category_id"],
-                    "subcategory_id": item["subcategory_id"],
-                    "discount_id"   : item["discount_id"],
-                    "image_url"     : item["image_url"],
-                    "created_at"    : item["created_at"],
-                    "images_slider" : list(ProductImage.objects.filter(product_id = item["id"]).values_list('image_url', flat=True))
-                }for item in products]            
-                
-                return JsonResponse({"result" : result}, status = 200)
-            return JsonResponse({"message" : "PRODUCT_DOES_NOT_EXIST"}, status=404)
\ No newline at end of file
+            product = feed_queryset(Product.objects.alive().filter(id=product_id)).first()
+            if not product:
+                return JsonResponse({"message" : "PRODUCT_DOES_NOT_EXIST"}, status=404)
+
+            view_counter.incr(Product, product.id)
+
+            result = serialize_product(product, category_tree.get())
+            result.update({
+                "access_range"  : product.access_range,
+                "images_slider" : result["image_url"],
+            })
+
+            return JsonResponse({"result" : [result]}, status = 200)
+
+class ProductFeedView(View):
+    @replica_reads
+    @login_check
+    def get(self, request):
+        address_id = request.GET.get('address', None)
+        if address_id is not None and not address_id.isdigit():
+            return JsonResponse({"message" : "INVALID_ADDRESS"}, status=400)
+
+        if address_id is None and request.user:
+            address_id = FullAddress.objects.alive().filter(user=request.user)\
+                .order_by('-created_at').values_list('full_address_id', flat=True).first()
+
+        location = Address.objects.alive().filter(id=address_id).values('latitude', 'longitude').first() if address_id else None
+        if not location:
+            return JsonResponse({"message" : "ADDRESS_DOES_NOT_EXIST"}, status=404)
+
+        try:
+            coverages, next_cursor = keyset_paginate(
+                ProductCoverage.objects.filter(cell=cell_of(location['latitude'], location['longitude'])),
+                FEED_SORT,
+                cursor = request.GET.get('cursor', None),
+                limit  = FEED_LIMIT
+            )
+        except ValueError:
+            return JsonResponse({"message" : "INVALID_CURSOR"}, status=400)
+
+        product_ids = [coverage.product_id for coverage in coverages]
+        products    = feed_queryset(Product.objects.alive()).in_bulk(product_ids)
+        categories  = category_tree.get()
+        result      = []
+        for product in (products[product_id] for product_id in product_ids if product_id in products):
+            distance = haversine(location['latitude'], location['longitude'], product.address.latitude, product.address.longitude)
+            if distance > access_range_of(product.access_range):
+                continue
+            item = serialize_product(product, categories)
+            item["distance"] = round(distance, 2)
+            result.append(item)
+
+        return JsonResponse({"message" : "SUCCESS", "result" : result, "next_cursor" : next_cursor}, status=200)
+
+class CategoryView(View):
+    def get(self, request):
+        categories = category_tree.get()
+
+        if request.headers.get('If-None-Match', None) == categories.etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(categories.body, content_type='application/json')
+
+        response['ETag']          = categories.etag
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+class ProductHomeView(View):
+    @login_check
+    def get(self, request):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        offset = request.GET.get('offset', '0')
+        if not offset.isdigit():
+            return JsonResponse({"message" : "INVALID_OFFSET"}, status=400)
+        offset = int(offset)
+
+        candidates = home_candidates(request.user)
+        page       = candidates[offset:offset + HOME_PAGE_SIZE]
+        products   = feed_queryset(Product.objects.alive().filter(id__in=page)).in_bulk()
+        categories = category_tree.get()
+
+        return JsonResponse({
+            "message"     : "SUCCESS",
+            "result"      : [serialize_product(products[id], categories) for id in page if id in products],
+            "next_offset" : offset + HOME_PAGE_SIZE if offset + HOME_PAGE_SIZE < len(candidates) else None,
+        }, status=200)
+
+class ProductLikeView(View):
+    @login_check
+    def post(self, request, product_id):
+        return self.set_liked(request, product_id, True)
+
+    @login_check
+    def delete(self, request, product_id):
+        return self.set_liked(request, product_id, False)
+
+    def set_liked(self, request, product_id, liked):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        if not Product.objects.alive().filter(id=product_id).exists():
+            return JsonResponse({"message" : "PRODUCT_DOES_NOT_EXIST"}, status=404)
+
+        set_wishlist(request.user, product_id, liked)
+
+        return JsonResponse({
+            "message"    : "SUCCESS",
+            "is_liked"   : liked,
+            "like_count" : Product.objects.filter(id=product_id).values_list('like_count', flat=True).first(),
+        }, status=200)
+
+class ProductExportView(View):
+    @login_check
+    def get(self, request):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({"message" : "FORBIDDEN"}, status=403)
+
+        products = Product.objects.alive().order_by('id')
+        return StreamingJsonResponse(iter_serialized(products, EXPORT_CHUNK_SIZE), {"message" : "SUCCESS"})
+
+@replica_reads
+async def async_product_list(request, type):
+    categories = await run_query(category_tree.get)
+    try:
+        products, next_cursor = await run_query(lambda: list_products(type, request.GET))
+    except ValueError as error:
+        return JsonResponse({"message" : str(error)}, status=400)
+
+    return JsonResponse({
+        "message"     : "SUCCESS",
+        "result"      : [serialize_product(product, categories) for product in products],
+        "next_cursor" : next_cursor,
+    }, status=200)
+
+@replica_reads
+async def async_product_detail(request, product_id):
+    product, images, rating, categories = await asyncio.gather(
+        run_query(lambda: Product.objects.alive().select_related('uploader', 'address').filter(id=product_id).first()),
+        run_query(lambda: list(ProductImage.objects.alive().filter(product_id=product_id).order_by('id'))),
+        run_query(lambda: ProductRating.objects.filter(product_id=product_id).first()),
+        run_query(category_tree.get),
+    )
+    if not product:
+        return JsonResponse({"message" : "PRODUCT_DOES_NOT_EXIST"}, status=404)
+
+    product.images = images
+    Product._meta.get_field('rating').set_cached_value(product, rating)
+    view_counter.incr(Product, product.id)
+
+    result = serialize_product(product, categories)
+    result.update({
+        "access_range"  : product.access_range,
+        "images_slider" : result["image_url"],
+    })
+
+    return JsonResponse({"result" : [result]}, status=200)
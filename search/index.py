@@ -0,0 +1,81 @@
+import re, unicodedata
+
+from collections import Counter
+
+from django.db        import transaction
+from django.db.models import Count, Sum
+
+from .models import SearchPosting
+
+WORD          = re.compile(r'\w+')
+NAME_WEIGHT   = 3
+MAX_TOKENS    = 20
+INDEX_FIELDS  = {
+    SearchPosting.PRODUCT : ('product_category_id', {'name', 'description', 'product_category', 'address', 'deleted_at'}),
+    SearchPosting.NEARBY  : ('nearby_category_id', {'name', 'description', 'nearby_category', 'address', 'deleted_at'}),
+}
+
+def tokenize(text):
+    """
+    Character bigrams of every word, so Korean compounds and particles still match
+    ("자전거를" and "자전거" share 자전/전거). One-letter words are kept as they are.
+    """
+    tokens = []
+    for word in WORD.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+def doc_type_of(instance):
+    return SearchPosting.NEARBY if instance._meta.model_name == 'nearby' else SearchPosting.PRODUCT
+
+def postings_for(instance):
+    doc_type       = doc_type_of(instance)
+    category_field = INDEX_FIELDS[doc_type][0]
+
+    weights = Counter()
+    for token in tokenize(instance.name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(instance.description):
+        weights[token] += 1
+
+    return [SearchPosting(
+        token       = token,
+        doc_type    = doc_type,
+        doc_id      = instance.id,
+        category_id = getattr(instance, category_field),
+        address_id  = instance.address_id,
+        weight      = weight,
+    ) for token, weight in weights.items()]
+
+def index_document(instance):
+    doc_type = doc_type_of(instance)
+    with transaction.atomic():
+        SearchPosting.objects.filter(doc_type=doc_type, doc_id=instance.id).delete()
+        if instance.deleted_at is None:
+            SearchPosting.objects.bulk_create(postings_for(instance))
+
+def remove_documents(doc_type, doc_ids):
+    SearchPosting.objects.filter(doc_type=doc_type, doc_id__in=doc_ids).delete()
+
+def search(query, doc_type, category_id=None, address_id=None, limit=20):
+    """
+    Ids of documents containing every token of query, best match first.
+    The score adds up the token weights, so hits in the name outrank hits in the description.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_TOKENS]
+    if not tokens:
+        return []
+
+    postings = SearchPosting.objects.filter(token__in=tokens, doc_type=doc_type)
+    if category_id:
+        postings = postings.filter(category_id=category_id)
+    if address_id:
+        postings = postings.filter(address_id=address_id)
+
+    return list(postings.values('doc_id').annotate(
+        matched = Count('token', distinct=True),
+        score   = Sum('weight')
+    ).filter(matched=len(tokens)).order_by('-score', '-doc_id').values_list('doc_id', flat=True)[:limit])
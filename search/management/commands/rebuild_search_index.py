@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+
+from product.models import Product
+from nearby.models  import Nearby
+from search.index   import INDEX_FIELDS, doc_type_of, postings_for
+from search.models  import SearchPosting
+
+class Command(BaseCommand):
+    help = 'Rebuild the search postings for every live product and nearby post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        for model in (Product, Nearby):
+            doc_type = doc_type_of(model)
+            SearchPosting.objects.filter(doc_type=doc_type).delete()
+
+            indexed = 0
+            chunk   = []
+            rows    = model.objects.alive().only(
+                'id', 'name', 'description', 'address_id', 'deleted_at', INDEX_FIELDS[doc_type][0]
+            ).order_by('id')
+            for instance in rows.iterator(chunk_size=chunk_size):
+                chunk.append(instance)
+                if len(chunk) == chunk_size:
+                    indexed += self.write_chunk(chunk)
+                    chunk    = []
+            if chunk:
+                indexed += self.write_chunk(chunk)
+
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {model._meta.verbose_name_plural}'))
+
+    def write_chunk(self, instances):
+        with transaction.atomic():
+            SearchPosting.objects.bulk_create(
+                [posting for instance in instances for posting in postings_for(instance)],
+                batch_size = 5000
+            )
+        return len(instances)
@@ -0,0 +1,19 @@
+from django.db import models
+
+class SearchPosting(models.Model):
+    PRODUCT = 'product'
+    NEARBY  = 'nearby'
+
+    token       = models.CharField(max_length=10)
+    doc_type    = models.CharField(max_length=10)
+    doc_id      = models.IntegerField()
+    category_id = models.IntegerField(null=True)
+    address_id  = models.IntegerField(null=True)
+    weight      = models.IntegerField(default=1)
+
+    class Meta:
+        db_table = 'searchpostings'
+        indexes  = [
+            models.Index(fields=['token', 'doc_type', 'doc_id'], name='searchpostings_token_idx'),
+            models.Index(fields=['doc_type', 'doc_id'], name='searchpostings_doc_idx'),
+        ]
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch          import receiver
+
+from kiwimarket.softdelete import soft_deleted
+from product.models        import Product
+from nearby.models         import Nearby
+
+from .index import INDEX_FIELDS, doc_type_of, index_document, remove_documents
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Nearby)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not INDEX_FIELDS[doc_type_of(instance)][1].intersection(update_fields):
+        return
+    index_document(instance)
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Nearby)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_documents(doc_type_of(instance), [instance.id])
+
+@receiver(soft_deleted, sender=Product)
+@receiver(soft_deleted, sender=Nearby)
+def remove_soft_deleted(sender, pks, **kwargs):
+    remove_documents(doc_type_of(sender), pks)
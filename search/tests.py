@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+
+from product.models import Product
+
+from .index  import tokenize, search
+from .models import SearchPosting
+
+class TokenizeTest(SimpleTestCase):
+    def test_bigrams_match_words_with_particles(self):
+        self.assertTrue(set(tokenize('자전거')) <= set(tokenize('자전거를 팝니다')))
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        # saving a product indexes it through the search signals
+        self.bike = Product.objects.create(name='자전거 팝니다', price=Decimal(1000), description='거의 새것')
+        Product.objects.create(name='책상', price=Decimal(1000), description='자전거 아님')
+
+    def test_name_hits_rank_first(self):
+        self.assertEqual(search('자전거', SearchPosting.PRODUCT)[0], self.bike.id)
+
+    def test_returns_matching_products(self):
+        response = self.client.get('/search', {'q' : '자전거'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result'][0]['id'], self.bike.id)
+
+    def test_non_numeric_filters_are_rejected(self):
+        for params, message in (({'category' : 'x'}, 'INVALID_CATEGORY'), ({'address' : '1 OR 1'}, 'INVALID_ADDRESS')):
+            response = self.client.get('/search', {'q' : '자전거', **params})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], message)
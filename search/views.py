@@ -0,0 +1,52 @@
+from django.views import View
+from django.http  import JsonResponse
+
+from kiwimarket.routers  import replica_reads
+from product.categories  import category_tree
+from product.models      import Product
+from product.serializers import feed_queryset as product_queryset, serialize_product
+from nearby.models       import Nearby
+from nearby.serializers  import feed_queryset as nearby_queryset, serialize_nearby
+
+from .index  import search
+from .models import SearchPosting
+
+SEARCH_LIMIT = 40
+SEARCH_TYPES = {
+    SearchPosting.PRODUCT : (Product, product_queryset, serialize_product),
+    SearchPosting.NEARBY  : (Nearby, nearby_queryset, serialize_nearby),
+}
+
+class SearchView(View):
+    @replica_reads
+    def get(self, request):
+        query    = request.GET.get('q', '').strip()
+        doc_type = request.GET.get('type', SearchPosting.PRODUCT)
+
+        category_id = request.GET.get('category', None)
+        address_id  = request.GET.get('address', None)
+
+        if not query:
+            return JsonResponse({"message" : "KEY_ERROR"}, status=400)
+        if doc_type not in SEARCH_TYPES:
+            return JsonResponse({"message" : "INVALID_TYPE"}, status=400)
+        if category_id and not category_id.isdigit():
+            return JsonResponse({"message" : "INVALID_CATEGORY"}, status=400)
+        if address_id and not address_id.isdigit():
+            return JsonResponse({"message" : "INVALID_ADDRESS"}, status=400)
+
+        model, queryset, serialize = SEARCH_TYPES[doc_type]
+        ids = search(
+            query,
+            doc_type,
+            category_id = category_id,
+            address_id  = address_id,
+            limit       = SEARCH_LIMIT
+        )
+        documents  = queryset(model.objects.alive().filter(id__in=ids)).in_bulk()
+        categories = category_tree.get()
+
+        return JsonResponse({
+            "message" : "SUCCESS",
+            "result"  : [serialize(documents[doc_id], categories) for doc_id in ids if doc_id in documents],
+        }, status=200)
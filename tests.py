@@ -0,0 +1,250 @@
+import jwt, time, asyncio
+
+from datetime      import datetime, timezone
+from unittest.mock import patch
+
+from asgiref.sync      import async_to_sync
+from django.core.cache import cache
+from django.db         import DatabaseError, connection
+from django.db.models  import QuerySet
+from django.http       import HttpResponse
+from django.test       import AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from benchmarks            import suite
+from kiwimarket.counters   import ViewCounter
+from kiwimarket.metrics    import registry
+from kiwimarket.middleware import MetricsMiddleware, ReplicaPinMiddleware
+from kiwimarket.routers    import ReplicaRouter, replica_health, replica_reads
+from kiwimarket.softdelete import soft_deleted
+from my_settings           import SECRET_KEY, ALGORITHM
+from nearby.models         import Nearby, NearbyImage, NearbyComment
+from product.models        import Product
+from user.models           import User
+from utils                 import encode_cursor, decode_cursor, keyset_paginate, run_query
+
+class CursorTest(TestCase):
+    def test_datetime_round_trip_keeps_microseconds(self):
+        created_at = datetime(2021, 1, 2, 3, 4, 54, 123456, tzinfo=timezone.utc)
+        cursor     = encode_cursor([created_at, 7])
+
+        self.assertEqual(decode_cursor(cursor, Product, ['created_at', 'id']), [created_at, 7])
+
+    def test_malformed_values_raise_value_error(self):
+        for values in (['notadate', 1], ['2020-01-01', 'x']):
+            with self.assertRaisesMessage(ValueError, 'INVALID_CURSOR'):
+                decode_cursor(encode_cursor(values), Product, ['created_at', 'id'])
+
+    def test_malformed_encoding_raises_value_error(self):
+        with self.assertRaisesMessage(ValueError, 'INVALID_CURSOR'):
+            decode_cursor('not base64!', Product, ['created_at', 'id'])
+
+class KeysetPaginateTest(TestCase):
+    def setUp(self):
+        # rows that differ only in the microseconds of created_at
+        base = datetime(2021, 1, 2, 3, 4, 54, 123000, tzinfo=timezone.utc)
+        for microsecond in (123000, 123400, 123456, 123999):
+            product = Product.objects.create(name=f'product {microsecond}', price=1000, description='')
+            Product.objects.filter(id=product.id).update(created_at=base.replace(microsecond=microsecond))
+
+    def pages(self, ordering):
+        seen, cursor = [], None
+        # bounded, so a cursor that keeps repeating a row fails instead of looping
+        for _ in range(10):
+            rows, cursor = keyset_paginate(Product.objects.all(), ordering, cursor=cursor, limit=1)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                break
+        return seen
+
+    def test_descending_pages_skip_nothing(self):
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.pages(('-created_at', '-id')), expected)
+
+    def test_ascending_pages_repeat_nothing(self):
+        expected = list(Product.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(self.pages(('created_at', 'id')), expected)
+
+class MetricsEndpointTest(TestCase):
+    def test_scrape_needs_the_token_even_from_loopback(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        with patch('views.METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_allowed_address_needs_no_token(self):
+        with patch('views.METRICS_ALLOWED_IPS', ('10.0.0.5',)):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+class MetricsMiddlewareTest(TestCase):
+    def test_streaming_response_is_recorded_after_the_body(self):
+        cache.clear()
+        Product.objects.create(name='아이폰', price=1000, description='')
+        user  = User.objects.create(phone_number='+821000000001', nickname='staff', email='staff@kiwimarket.com', is_staff=True)
+        token = jwt.encode({'user_id' : user.id}, SECRET_KEY, algorithm=ALGORITHM)
+        registry.views.clear()
+
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get('/product/export', HTTP_AUTHORIZATION=token)
+        self.assertEqual(registry.views, {})
+
+        with CaptureQueriesContext(connection) as streamed:
+            body = b''.join(response.streaming_content)
+        metrics = next(metrics for view, metrics in registry.views.items() if view.endswith('ProductExportView'))
+        self.assertEqual(metrics.response_bytes, len(body))
+        self.assertGreater(len(streamed), 0)
+        self.assertEqual(metrics.sql_queries, len(before) + len(streamed))
+
+class ViewCounterTest(TestCase):
+    def setUp(self):
+        self.counter = ViewCounter(flush_interval=3600, flush_threshold=1000)
+        self.product = Product.objects.create(name='아이폰', price=1000, description='')
+        self.nearby  = Nearby.objects.create(name='산책', price=0, description='')
+        patcher = patch.object(self.counter, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_writes_one_update_per_increment(self):
+        for _ in range(3):
+            self.counter.incr(Product, self.product.id)
+        self.counter.incr(Nearby, self.nearby.id)
+        self.product.viewed = 0
+        self.assertEqual(self.counter.merged(self.product), 3)
+
+        # the two UPDATEs, inside the savepoint atomic() opens within the test transaction
+        with self.assertNumQueries(4):
+            self.assertEqual(self.counter.flush(), 2)
+
+        self.assertEqual(Product.objects.get(id=self.product.id).viewed, 3)
+        self.assertEqual(Nearby.objects.get(id=self.nearby.id).viewed, 1)
+
+    def test_flush_thread_recycles_its_connection(self):
+        self.counter.incr(Product, self.product.id)
+        with patch('kiwimarket.counters.close_old_connections') as close_old_connections:
+            self.counter.stop()
+
+        close_old_connections.assert_called_once_with()
+        self.assertEqual(Product.objects.get(id=self.product.id).viewed, 1)
+
+    def test_failed_flush_keeps_the_counts(self):
+        self.counter.incr(Product, self.product.id)
+        with patch.object(QuerySet, 'update', side_effect=DatabaseError), self.assertLogs('kiwimarket.counters', 'ERROR'):
+            self.assertEqual(self.counter.flush(), 0)
+
+        self.assertEqual(self.counter.pending_for(Product, self.product.id), 1)
+        self.counter.flush()
+        self.assertEqual(Product.objects.get(id=self.product.id).viewed, 1)
+
+class SoftDeleteTest(TestCase):
+    def setUp(self):
+        self.nearbys = [Nearby.objects.create(name=f'산책 {index}', price=0, description='') for index in range(2)]
+        for nearby in self.nearbys:
+            NearbyImage.objects.create(nearby=nearby, image_url='https://images.kiwimarket.com/1.jpg')
+            NearbyComment.objects.create(nearby=nearby, content='같이 가요')
+
+    def test_bulk_soft_delete_cascades_and_signals_once(self):
+        received = []
+        def receiver(sender, pks, **kwargs):
+            received.append((sender, sorted(pks)))
+        soft_deleted.connect(receiver, sender=Nearby)
+        self.addCleanup(soft_deleted.disconnect, receiver, sender=Nearby)
+
+        self.assertEqual(Nearby.objects.filter(id=self.nearbys[0].id).soft_delete(), 1)
+        self.assertEqual(Nearby.objects.filter(id=self.nearbys[0].id).soft_delete(), 0)
+
+        self.assertEqual(received, [(Nearby, [self.nearbys[0].id])])
+        self.assertEqual(list(Nearby.objects.alive()), [self.nearbys[1]])
+        self.assertEqual(NearbyImage.objects.alive().get().nearby_id, self.nearbys[1].id)
+        self.assertEqual(NearbyComment.objects.alive().get().nearby_id, self.nearbys[1].id)
+
+    def test_row_soft_delete_cascades(self):
+        self.nearbys[1].soft_delete()
+
+        self.assertEqual(list(Nearby.objects.dead()), [self.nearbys[1]])
+        self.assertEqual(NearbyImage.objects.dead().get().nearby_id, self.nearbys[1].id)
+        self.assertEqual(NearbyComment.objects.dead().get().nearby_id, self.nearbys[1].id)
+
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        patcher     = patch.object(replica_health, 'available', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def middleware(self, view):
+        return ReplicaPinMiddleware(replica_reads(view))
+
+    def test_reads_use_the_replica_only_inside_replica_reads(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertEqual(replica_reads(lambda: self.router.db_for_read(Product))(), 'replica')
+
+    def test_write_pins_the_rest_of_the_request_and_the_next_ones(self):
+        reads = []
+        def view(request):
+            reads.append(self.router.db_for_read(Product))
+            self.router.db_for_write(Product)
+            reads.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        response = self.middleware(view)(RequestFactory().get('/'))
+
+        self.assertEqual(reads, ['replica', 'default'])
+        self.assertIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[ReplicaPinMiddleware.cookie_name] = '1'
+        self.assertEqual(self.middleware(lambda request: HttpResponse(self.router.db_for_read(Product)))(request).content, b'default')
+
+    def test_write_on_a_worker_thread_pins_the_request(self):
+        async def view(request):
+            await run_query(lambda: self.router.db_for_write(Product))
+            return HttpResponse(await run_query(lambda: self.router.db_for_read(Product)))
+
+        response = async_to_sync(self.middleware(view))(AsyncRequestFactory().get('/'))
+
+        self.assertEqual(response.content, b'default')
+        self.assertIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+
+    def test_unhealthy_replica_is_skipped(self):
+        with patch.object(replica_health, 'available', return_value=False):
+            self.assertEqual(replica_reads(lambda: self.router.db_for_read(Product))(), 'default')
+
+class BenchmarkCompareTest(SimpleTestCase):
+    baseline = {'product_list' : {'p95_ms' : 4.0, 'queries' : 2}}
+
+    def compare(self, p95_ms, queries=2):
+        return suite.compare({'product_list' : {'p95_ms' : p95_ms, 'queries' : queries}}, self.baseline, 0.25, 10.0)
+
+    def test_small_absolute_slowdowns_are_tolerated(self):
+        self.assertEqual(self.compare(13.9), ([], []))
+
+    def test_latency_and_queries_are_reported_apart(self):
+        queries, latency = self.compare(20.0, queries=3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(latency), 1)
+
+class AsyncMiddlewareTest(TransactionTestCase):
+    # async views query on worker threads, which only see committed rows
+    async def test_async_requests_are_served_concurrently(self):
+        async def view(request):
+            await asyncio.sleep(0.2)
+            return HttpResponse()
+        handler = MetricsMiddleware(ReplicaPinMiddleware(view))
+        self.assertTrue(asyncio.iscoroutinefunction(handler))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(handler(AsyncRequestFactory().get('/')) for _ in range(10)))
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_queries_on_worker_threads_are_counted(self):
+        product = Product.objects.create(name='아이폰', price=1000, description='')
+        registry.views.clear()
+
+        response = async_to_sync(AsyncClient().get)(f'/product/async/{product.id}')
+
+        self.assertEqual(response.status_code, 200)
+        metrics = next(metrics for view, metrics in registry.views.items() if view.endswith('async_product_detail'))
+        self.assertGreaterEqual(metrics.sql_queries, 3)
@@ -0,0 +1,231 @@
+import threading, logging
+
+from collections import deque
+
+from django.conf       import settings
+from django.core.cache import cache
+from django.db         import transaction
+
+from kiwimarket.counters import BufferedWriter
+from product.models      import Product
+
+from .models import User, KeywordAlarm, KeywordAddress, KeywordNotification
+
+logger = logging.getLogger(__name__)
+
+def normalize(text):
+    return ''.join(text.lower().split())
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords. search() walks the text once,
+    so its cost depends on the text length and the number of hits, not on how
+    many keywords were compiled in.
+    """
+    def __init__(self, keywords):
+        self.goto    = [{}]
+        self.fail    = [0]
+        self.outputs = [[]]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.outputs[state].append(keyword)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child]     = self.goto[fallback].get(char, 0)
+                self.outputs[child] += self.outputs[self.fail[child]]
+
+    def search(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found.update(self.outputs[state])
+        return found
+
+class AlarmMatcher:
+    """
+    One automaton per address, built from that address's live keyword alarms.
+    Alarm changes bump a per-address version in the Django cache and only that
+    address's automaton is rebuilt, lazily, on its next match.
+    """
+    VERSION_KEY = 'keyword_alarm_version:{}'
+
+    def __init__(self):
+        self.automata = {}
+        self.lock     = threading.Lock()
+
+    def invalidate(self, address_ids):
+        for address_id in set(address_ids):
+            if address_id is None:
+                continue
+            key = self.VERSION_KEY.format(address_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+            with self.lock:
+                self.automata.pop(address_id, None)
+
+    def automaton_for(self, address_id):
+        version = cache.get(self.VERSION_KEY.format(address_id), 0)
+        with self.lock:
+            cached = self.automata.get(address_id)
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+
+        subscribers = {}
+        rows        = KeywordAddress.objects.filter(
+            address_id                        = address_id,
+            deleted_at__isnull                = True,
+            keyword_alarm__isnull             = False,
+            keyword_alarm__deleted_at__isnull = True,
+        ).values_list('keyword_alarm_id', 'keyword_alarm__keyword', 'keyword_alarm__user_id')
+        for alarm_id, keyword, user_id in rows:
+            keyword = normalize(keyword)
+            if keyword:
+                subscribers.setdefault(keyword, []).append((alarm_id, user_id))
+
+        automaton = KeywordAutomaton(subscribers)
+        with self.lock:
+            self.automata[address_id] = (version, automaton, subscribers)
+        return automaton, subscribers
+
+    def match(self, product):
+        if not product.address_id:
+            return []
+
+        automaton, subscribers = self.automaton_for(product.address_id)
+        if not subscribers:
+            return []
+
+        text    = normalize(f'{product.name} {product.description}')
+        matched = {}
+        for keyword in automaton.search(text):
+            for alarm_id, user_id in subscribers[keyword]:
+                if user_id and user_id != product.uploader_id:
+                    matched.setdefault(user_id, alarm_id)
+        return [(alarm_id, user_id) for user_id, alarm_id in matched.items()]
+
+class AlarmQueue(BufferedWriter):
+    """
+    Collects keyword notifications and inserts them with bulk_create in batches.
+    When a batch fails, rows whose alarm, user or product is gone are dropped and the
+    rest retried; a row that still fails is kept for at most max_retries flushes, and
+    the queue never holds more than max_pending rows.
+    """
+    def __init__(self, flush_interval=5, batch_size=500, max_retries=3, max_pending=10000):
+        super().__init__(flush_interval)
+        self.batch_size  = batch_size
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.pending     = []
+        self.failing     = False
+
+    def enqueue(self, notifications):
+        if not notifications:
+            return
+        with self.lock:
+            self.pending.extend(notifications)
+            self.trim()
+            size = len(self.pending)
+        self.start()
+        # while the database is refusing batches, leave retries to the flush thread
+        if size >= self.batch_size and not self.failing:
+            self.flush()
+
+    def trim(self):
+        overflow = len(self.pending) - self.max_pending
+        if overflow > 0:
+            logger.error('keyword alarm queue is full, dropping %d oldest notifications', overflow)
+            del self.pending[:overflow]
+
+    def insert(self, notifications):
+        with transaction.atomic():
+            KeywordNotification.objects.bulk_create(notifications, batch_size=self.batch_size)
+
+    def deliverable(self, notifications):
+        """Drops notifications whose alarm, user or product was deleted since they were queued."""
+        alarm_ids   = set(KeywordAlarm.objects.alive().filter(
+            id__in=[row.keyword_alarm_id for row in notifications]).values_list('id', flat=True))
+        user_ids    = set(User.objects.filter(
+            id__in=[row.user_id for row in notifications]).values_list('id', flat=True))
+        product_ids = set(Product.objects.filter(
+            id__in=[row.product_id for row in notifications]).values_list('id', flat=True))
+
+        kept = [
+            row for row in notifications
+            if row.keyword_alarm_id in alarm_ids and row.user_id in user_ids and row.product_id in product_ids
+        ]
+        if len(kept) < len(notifications):
+            logger.warning('dropped %d keyword notifications for deleted rows', len(notifications) - len(kept))
+        return kept
+
+    def requeue(self, notifications):
+        kept = []
+        for row in notifications:
+            row.flush_attempts = getattr(row, 'flush_attempts', 0) + 1
+            if row.flush_attempts < self.max_retries:
+                kept.append(row)
+        if len(kept) < len(notifications):
+            logger.error('gave up on %d keyword notifications after %d attempts', len(notifications) - len(kept), self.max_retries)
+
+        with self.lock:
+            self.pending[:0] = kept
+            self.trim()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                pending      = self.pending
+                self.pending = []
+            if not pending:
+                return 0
+
+            try:
+                self.insert(pending)
+                self.failing = False
+                return len(pending)
+            except Exception:
+                logger.warning('keyword alarm flush failed, retrying without rows for deleted data', exc_info=True)
+
+            try:
+                pending = self.deliverable(pending)
+                self.insert(pending)
+            except Exception:
+                logger.exception('keyword alarm flush failed, keeping %d notifications', len(pending))
+                self.failing = True
+                self.requeue(pending)
+                return 0
+            self.failing = False
+            return len(pending)
+
+alarm_matcher = AlarmMatcher()
+alarm_queue   = AlarmQueue(
+    flush_interval = getattr(settings, 'KEYWORD_ALARM_FLUSH_INTERVAL', 5),
+    batch_size     = getattr(settings, 'KEYWORD_ALARM_BATCH_SIZE', 500),
+    max_retries    = getattr(settings, 'KEYWORD_ALARM_MAX_RETRIES', 3),
+    max_pending    = getattr(settings, 'KEYWORD_ALARM_MAX_PENDING', 10000),
+)
+
+def notify_keyword_alarms(product):
+    alarm_queue.enqueue([
+        KeywordNotification(keyword_alarm_id=alarm_id, user_id=user_id, product_id=product.id)
+        for alarm_id, user_id in alarm_matcher.match(product)
+    ])
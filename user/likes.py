@@ -0,0 +1,67 @@
+from django.db        import transaction, IntegrityError
+from django.db.models import F, Count
+
+from product.models import Product
+
+from .models import User, Wishlist, UploaderLike
+
+def is_active(row):
+    return row is not None and row.is_liked and row.deleted_at is None
+
+def toggle(through, lookup, liked, counter_model, counter_id, counter_field):
+    """
+    Sets the like row identified by lookup to liked and moves the stored counter by
+    one only when the state actually changes, all in one transaction, so repeating
+    a request is a no-op. Returns whether the counter changed.
+    """
+    with transaction.atomic():
+        row = through.objects.select_for_update().filter(**lookup).first()
+        if row is None and liked:
+            try:
+                with transaction.atomic():
+                    row = through.objects.create(is_liked=True, **lookup)
+                was_liked = False
+            except IntegrityError:
+                # a concurrent request created the row first; fall back to updating it
+                row = through.objects.select_for_update().get(**lookup)
+                was_liked = is_active(row)
+        else:
+            was_liked = is_active(row)
+
+        if row is not None and is_active(row) != liked:
+            row.is_liked   = liked
+            row.deleted_at = None
+            row.save(update_fields=['is_liked', 'deleted_at'])
+
+        if was_liked == liked:
+            return False
+
+        counter_model.objects.filter(id=counter_id).update(**{counter_field : F(counter_field) + (1 if liked else -1)})
+        return True
+
+def set_wishlist(user, product_id, liked):
+    return toggle(Wishlist, {'user_id' : user.id, 'product_id' : product_id}, liked, Product, product_id, 'like_count')
+
+def set_uploader_like(user, uploader_id, liked):
+    return toggle(UploaderLike, {'user_id' : user.id, 'uploader_id' : uploader_id}, liked, User, uploader_id, 'follower_count')
+
+def like_counts(through, target, target_ids):
+    return dict(through.objects.alive().filter(is_liked=True, **{f'{target}_id__in' : target_ids})
+        .values(f'{target}_id').annotate(count=Count('id')).order_by().values_list(f'{target}_id', 'count'))
+
+def recount(model, field, through, target, ids):
+    """Rewrites the stored counter of every drifted row in ids and returns how many were fixed."""
+    counts  = like_counts(through, target, ids)
+    drifted = [
+        model(id=id, **{field : counts.get(id, 0)})
+        for id, stored in model.objects.filter(id__in=ids).values_list('id', field)
+        if stored != counts.get(id, 0)
+    ]
+    model.objects.bulk_update(drifted, [field])
+    return len(drifted)
+
+def recount_products(product_ids):
+    return recount(Product, 'like_count', Wishlist, 'product', product_ids)
+
+def recount_followers(user_ids):
+    return recount(User, 'follower_count', UploaderLike, 'uploader', user_ids)
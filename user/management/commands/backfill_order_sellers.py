@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+from django.db.models            import OuterRef, Subquery
+
+from kiwimarket.streaming import chunked
+from product.models       import Product
+from user.models          import Order
+
+class Command(BaseCommand):
+    help = 'Copy each product\'s uploader onto orders that were created before orders stored their seller'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        uploader  = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('uploader_id')[:1])
+        order_ids = Order.objects.filter(seller__isnull=True, product__isnull=False).order_by('id') \
+            .values_list('id', flat=True).iterator(chunk_size=options['chunk_size'])
+
+        filled = 0
+        for chunk in chunked(order_ids, options['chunk_size']):
+            with transaction.atomic():
+                filled += Order.objects.filter(id__in=chunk).update(seller_id=uploader)
+
+        self.stdout.write(self.style.SUCCESS(f'Filled the seller of {filled} orders'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from user.sms import sms_store
+
+class Command(BaseCommand):
+    help = 'Delete expired SMS verification codes from the authsms table in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        purged = sms_store.purge(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired SMS codes'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+
+from kiwimarket.streaming import chunked
+from user.models          import User
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s manner temperature score from the mannertemperatures table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recomputed = 0
+        user_ids   = User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=options['chunk_size'])
+        for chunk in chunked(user_ids, options['chunk_size']):
+            with transaction.atomic():
+                User.recompute_manner_scores(chunk)
+            recomputed += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed manner scores for {recomputed} users'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db                   import transaction
+
+from kiwimarket.streaming import chunked
+from product.models       import Product
+from user.likes           import recount_products, recount_followers
+from user.models          import User
+
+class Command(BaseCommand):
+    help = 'Fix drift between stored like/follower counters and the wishlists and uploaderliked tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed      = {}
+        for name, model, recount in (
+            ('products', Product, recount_products),
+            ('users', User, recount_followers),
+        ):
+            fixed[name] = 0
+            ids         = model.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size)
+            for chunk in chunked(ids, chunk_size):
+                with transaction.atomic():
+                    fixed[name] += recount(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Fixed like counts on {fixed["products"]} products and follower counts on {fixed["users"]} users'))
@@ -1,156 +1,218 @@
+from decimal import Decimal
+
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from kiwimarket.softdelete import SoftDeleteModel
 
 #from product.models import Product
 
-class User(models.Model):
+BASE_MANNER_TEMPERATURE = Decimal('36.5')
+
+class User(SoftDeleteModel):
     phone_number    = PhoneNumberField(null=False, blank=False, unique=True)
     nickname        = models.CharField(max_length=20, null=False, unique=True)
     profile_picture = models.URLField(max_length = 2000, null=True)
     email           = models.EmailField(max_length=100, unique=True)
     random_token    = models.IntegerField(null=True)
     anonymous       = models.BooleanField(default=False)
+    is_staff        = models.BooleanField(default=False)
     address         = models.ManyToManyField('Address', through='FullAddress') 
     wish_category   = models.ManyToManyField('product.ProductCategory', through = 'WishCategory')
     wishlist        = models.ManyToManyField('product.Product', through ='Wishlist', related_name='wishlist_user')
     manner_temp     = models.ManyToManyField('MannerTemperatureCategory', through = 'MannerTemperature')
     my_review       = models.ManyToManyField('product.Product', through = 'Review', related_name='my_review_user')
     liked_uploader  = models.ManyToManyField('self', through = 'UploaderLike', symmetrical = False)
+    manner_score    = models.DecimalField(max_digits=5, decimal_places=2, default=BASE_MANNER_TEMPERATURE)
+    follower_count  = models.IntegerField(default=0)
     created_at      = models.DateTimeField(auto_now_add = True) 
-    deleted_at      = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'users'
 
-class AuthSms(models.Model):
+    @classmethod
+    def adjust_manner_score(cls, user_id, delta):
+        cls.objects.filter(id=user_id).update(manner_score=F('manner_score') + delta)
+
+    @classmethod
+    def recompute_manner_scores(cls, user_ids):
+        points = dict(MannerTemperature.objects.alive().filter(user_id__in=user_ids, manner_temperature__deleted_at__isnull=True)
+            .values('user_id').annotate(total=Sum('manner_temperature__point')).order_by().values_list('user_id', 'total'))
+        users  = [cls(id=user_id, manner_score=BASE_MANNER_TEMPERATURE + (points.get(user_id) or 0)) for user_id in user_ids]
+        cls.objects.bulk_update(users, ['manner_score'])
+
+class AuthSms(SoftDeleteModel):
     phone_number = PhoneNumberField(null=False, blank=False, unique=True)
     auth_number  = models.IntegerField()
+    attempts     = models.IntegerField(default=0)
+    expires_at   = models.DateTimeField(null=True)
     created_at   = models.DateTimeField(auto_now_add = True) 
-    deleted_at   = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'authsms'
+        indexes  = [
+            models.Index(fields=['expires_at'], name='authsms_expires_at_idx'),
+        ]
 
-class Address(models.Model):
+class Address(SoftDeleteModel):
     address    = models.CharField(max_length=20, null=False)
     code       = models.IntegerField()
     longitude  = models.DecimalField(max_digits= 9, decimal_places=6) 
     latitude   = models.DecimalField(max_digits= 9, decimal_places=6)
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = "addresses"
 
-class FullAddress(models.Model):
+class FullAddress(SoftDeleteModel):
     full_address = models.ForeignKey('Address', on_delete = models.SET_NULL, null=True)
     user         = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     created_at   = models.DateTimeField(auto_now_add = True) 
-    deleted_at   = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'fulladdresses'
+        indexes  = [
+            models.Index(fields=['user', 'deleted_at', 'created_at'], name='fulladdresses_user_idx'),
+        ]
 
-class WishCategory(models.Model):
+class WishCategory(SoftDeleteModel):
     product_category    = models.ForeignKey('product.ProductCategory', on_delete = models.SET_NULL, null=True)
     user                = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     is_liked            = models.BooleanField()
     created_at          = models.DateTimeField(auto_now_add = True) 
-    deleted_at          = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'wishcategories'
 
-class Wishlist(models.Model):
+class Wishlist(SoftDeleteModel):
     product     = models.ForeignKey('product.Product', on_delete = models.SET_NULL, null=True)
     user        = models.ForeignKey('User', on_delete = models.SET_NULL, null=True, related_name='user_wishlist')
     is_liked    = models.BooleanField()
     created_at  = models.DateTimeField(auto_now_add = True)
-    deleted_at  = models.DateTimeField(null = True) 
 
     class Meta:
-        db_table = 'wishlists'
+        db_table        = 'wishlists'
+        unique_together = ('product', 'user')
     
-class KeywordAlarm(models.Model):
+class KeywordAlarm(SoftDeleteModel):
     keyword    = models.CharField(max_length=100)
     user       = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     address    = models.ManyToManyField('Address', through='KeywordAddress')
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
+
+    soft_delete_cascade = ('keywordaddress_set',)
 
     class Meta:
         db_table = 'keywordalarms'
 
-class KeywordAddress(models.Model):
+class KeywordAddress(SoftDeleteModel):
     keyword_alarm = models.ForeignKey('KeywordAlarm',on_delete = models.SET_NULL, null=True)
     address       = models.ForeignKey('Address',on_delete = models.SET_NULL, null=True)
     created_at    = models.DateTimeField(auto_now_add = True) 
-    deleted_at    = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'keywordaddresses'
+        indexes  = [
+            models.Index(fields=['address', 'deleted_at'], name='keywordaddresses_address_idx'),
+        ]
+
+class KeywordNotification(SoftDeleteModel):
+    keyword_alarm = models.ForeignKey('KeywordAlarm', on_delete = models.SET_NULL, null=True)
+    user          = models.ForeignKey('User', on_delete = models.SET_NULL, null=True, related_name='keyword_notifications')
+    product       = models.ForeignKey('product.Product', on_delete = models.SET_NULL, null=True)
+    is_read       = models.BooleanField(default=False)
+    created_at    = models.DateTimeField(auto_now_add = True) 
 
-class OftenUsedDescription(models.Model):
+    class Meta:
+        db_table = 'keywordnotifications'
+
+class OftenUsedDescription(SoftDeleteModel):
     user        = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     description = models.CharField(max_length=2000)
     created_at  = models.DateTimeField(auto_now_add = True) 
-    deleted_at  = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'oftenuseddescription'
 
-class UploaderLike(models.Model):
+class UploaderLike(SoftDeleteModel):
     uploader   = models.ForeignKey('User', on_delete = models.SET_NULL, null=True, related_name='uploader_uploaderlike')
     user       = models.ForeignKey('User', on_delete = models.SET_NULL, null=True, related_name='user_uploaderlike')    
     is_liked   = models.BooleanField()
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
-        db_table = 'uploaderliked'
+        db_table        = 'uploaderliked'
+        unique_together = ('uploader', 'user')
 
-class Order(models.Model):
+class Order(SoftDeleteModel):
     product     = models.ForeignKey('product.Product', on_delete = models.SET_NULL, null=True)
     user        = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
-    order_date  = models.DateTimeField(auto_now = True)
+    seller      = models.ForeignKey('User', on_delete = models.SET_NULL, null=True, related_name='sales')
+    order_date  = models.DateTimeField(default = timezone.now)
     created_at  = models.DateTimeField(auto_now_add = True) 
-    deleted_at  = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'orders'
+        indexes  = [
+            models.Index(fields=['user', 'deleted_at', 'order_date', 'id'], name='orders_buyer_timeline_idx'),
+            models.Index(fields=['seller', 'deleted_at', 'order_date', 'id'], name='orders_seller_timeline_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # the seller is copied from the product so sales timelines need no join
+        if self.seller_id is None and self.product_id is not None:
+            from product.models import Product
+            self.seller_id = Product.objects.filter(id=self.product_id).values_list('uploader_id', flat=True).first()
+        super().save(*args, **kwargs)
+
+class OrderStatus(SoftDeleteModel):
+    ON_SALE  = '판매중'
+    RESERVED = '예약중'
+    SOLD     = '거래완료'
 
-class OrderStatus(models.Model):
     name       = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add = True) 
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'orderstatuses'
 
-class MannerTemperature(models.Model):
+class MannerTemperature(SoftDeleteModel):
     user                = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     manner_temperature  = models.ForeignKey('MannerTemperatureCategory', on_delete = models.SET_NULL, null=True)
     created_at          = models.DateTimeField(auto_now_add = True)     
-    deleted_at          = models.DateTimeField(null = True) 
 
     class Meta: 
         db_table = 'mannertemperatures'
 
-class MannerTemperatureCategory(models.Model):
+    def save(self, *args, **kwargs):
+        # keeps User.manner_score, maintained in post_save, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class MannerTemperatureCategory(SoftDeleteModel):
     name       = models.CharField(max_length=100)
     point      = models.DecimalField(max_digits= 2, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add = True)     
-    deleted_at = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'mannertemperaturescategories'
 
-class Review(models.Model):
+class Review(SoftDeleteModel):
     uploader     = models.ForeignKey('User', on_delete = models.SET_NULL, null=True)
     product      = models.ForeignKey('product.Product', on_delete = models.SET_NULL, null=True)
     description  = models.CharField(max_length=2000)
+    star_rating  = models.IntegerField()
     created_at   = models.DateTimeField(auto_now_add = True) 
-    deleted_at   = models.DateTimeField(null = True) 
 
     class Meta:
         db_table = 'reviews'
+        indexes  = [
+            models.Index(fields=['product', 'deleted_at'], name='reviews_product_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # keeps the product rating summary, maintained in post_save, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
@@ -0,0 +1,63 @@
+from django.db.models import Min
+
+from product.models import ProductImage
+from utils          import TTLCache, keyset_paginate
+
+from .models import Order, OrderStatus
+
+TIMELINE_ORDERING  = ('-order_date', '-id')
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_ROLES     = {
+    "purchases" : 'user',
+    "sales"     : 'seller',
+}
+
+class OrderStatusNames(TTLCache):
+    """
+    OrderStatus id to name, loaded once per process. Cleared when a status changes in
+    this process; other processes pick the change up after ttl.
+    """
+    def names(self):
+        names = self.get('names')
+        if names is None:
+            names = dict(OrderStatus.objects.alive().values_list('id', 'name'))
+            self.set('names', names)
+        return names
+
+order_status_names = OrderStatusNames(maxsize=1, ttl=600)
+
+def thumbnails(product_ids):
+    """First live image of each product, in one query."""
+    first_images = ProductImage.objects.alive().filter(product_id__in=product_ids) \
+        .values('product_id').annotate(first_id=Min('id')).order_by().values('first_id')
+    return dict(ProductImage.objects.filter(id__in=first_images).values_list('product_id', 'image_url'))
+
+def order_timeline(user, role, cursor=None, limit=TIMELINE_PAGE_SIZE):
+    """Returns (orders, next_cursor) for a user's purchases or sales; raises ValueError with the error message."""
+    if role not in TIMELINE_ROLES:
+        raise ValueError('INVALID_ROLE')
+
+    return keyset_paginate(
+        Order.objects.alive().filter(**{TIMELINE_ROLES[role] : user}).select_related('product'),
+        TIMELINE_ORDERING,
+        cursor = cursor,
+        limit  = limit
+    )
+
+def serialize_orders(orders):
+    names  = order_status_names.names()
+    images = thumbnails([order.product_id for order in orders if order.product_id])
+
+    return [{
+        "id"         : order.id,
+        "order_date" : order.order_date,
+        "buyer_id"   : order.user_id,
+        "seller_id"  : order.seller_id,
+        "product"    : {
+            "id"           : order.product.id,
+            "name"         : order.product.name,
+            "price"        : int(order.product.price),
+            "order_status" : names.get(order.product.order_status_id),
+            "thumbnail"    : images.get(order.product.id),
+        } if order.product else None,
+    } for order in orders]
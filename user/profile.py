@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.db.models  import Count, Sum
+
+from product.models import Product, ProductRating
+
+from .models import User, FullAddress, OrderStatus
+
+CACHE_KEY = 'profile:{}'
+CACHE_TTL = 600
+
+def build_profiles(user_ids):
+    """
+    Profile summaries for user_ids in four queries however many users are asked for:
+    the user rows, listings grouped by status, received reviews summed from the
+    product rating table, and the latest address of each user.
+    Follower count and manner temperature are already stored on the user row.
+    """
+    profiles = {
+        user['id'] : {
+            "id"              : user['id'],
+            "nickname"        : user['nickname'],
+            "profile_picture" : user['profile_picture'],
+            "manner_score"    : float(user['manner_score']),
+            "follower_count"  : user['follower_count'],
+            "address"         : None,
+            "on_sale_count"   : 0,
+            "reserved_count"  : 0,
+            "sold_count"      : 0,
+            "review_count"    : 0,
+            "star_rating"     : None,
+        }
+        for user in User.objects.alive().filter(id__in=user_ids)
+            .values('id', 'nickname', 'profile_picture', 'manner_score', 'follower_count')
+    }
+    if not profiles:
+        return profiles
+
+    status_fields = {
+        OrderStatus.RESERVED : "reserved_count",
+        OrderStatus.SOLD     : "sold_count",
+    }
+    listings = Product.objects.alive().filter(uploader_id__in=profiles) \
+        .values('uploader_id', 'order_status__name').annotate(count=Count('id')).order_by()
+    for row in listings:
+        # listings without a status are still for sale
+        profiles[row['uploader_id']][status_fields.get(row['order_status__name'], "on_sale_count")] += row['count']
+
+    reviews = ProductRating.objects.filter(product__uploader_id__in=profiles) \
+        .values('product__uploader_id').annotate(review_count=Sum('review_count'), rating_sum=Sum('rating_sum')).order_by()
+    for row in reviews:
+        profile = profiles[row['product__uploader_id']]
+        profile["review_count"] = row['review_count'] or 0
+        if profile["review_count"]:
+            profile["star_rating"] = round(row['rating_sum'] / profile["review_count"], 1)
+
+    addresses = FullAddress.objects.alive().filter(user_id__in=profiles, full_address__isnull=False) \
+        .order_by('user_id', '-created_at').values_list('user_id', 'full_address__address')
+    for user_id, address in addresses:
+        if profiles[user_id]["address"] is None:
+            profiles[user_id]["address"] = address
+
+    return profiles
+
+def get_profiles(user_ids):
+    """Cached profile summaries keyed by user id; users that do not exist are left out."""
+    user_ids = list(dict.fromkeys(user_ids))
+    cached   = cache.get_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+    profiles = {user_id : cached[CACHE_KEY.format(user_id)] for user_id in user_ids if CACHE_KEY.format(user_id) in cached}
+
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        built = build_profiles(missing)
+        cache.set_many({CACHE_KEY.format(user_id) : profile for user_id, profile in built.items()}, CACHE_TTL)
+        profiles.update(built)
+
+    return {user_id : profiles[user_id] for user_id in user_ids if user_id in profiles}
+
+def get_profile(user_id):
+    return get_profiles([user_id]).get(user_id)
+
+def invalidate(user_ids):
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in user_ids if user_id is not None])
@@ -0,0 +1,208 @@
+from django.db                import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch          import receiver
+
+from kiwimarket.softdelete import soft_deleted
+from product.models        import Product
+from utils                 import auth_cache
+
+from .alarms  import alarm_matcher, notify_keyword_alarms
+from .likes   import recount_products, recount_followers
+from .models  import (
+    User,
+    FullAddress,
+    KeywordAlarm,
+    KeywordAddress,
+    MannerTemperature,
+    MannerTemperatureCategory,
+    OrderStatus,
+    Review,
+    Wishlist,
+    UploaderLike
+)
+from .orders  import order_status_names
+from .profile import invalidate as invalidate_profile
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_cache(sender, instance, **kwargs):
+    # after commit, so a concurrent login cannot cache the row from before the write
+    transaction.on_commit(lambda: auth_cache.invalidate_user(instance.id))
+
+@receiver(soft_deleted, sender=User)
+def invalidate_deleted_users(sender, pks, **kwargs):
+    transaction.on_commit(lambda: auth_cache.invalidate_users(pks))
+
+def invalidate_alarm_addresses(address_ids):
+    # after commit, so a concurrent match cannot rebuild the automaton from before the write
+    address_ids = sorted({address_id for address_id in address_ids if address_id is not None})
+    if address_ids:
+        transaction.on_commit(lambda: alarm_matcher.invalidate(address_ids))
+
+@receiver(post_save, sender=KeywordAlarm)
+def invalidate_alarm_automaton(sender, instance, **kwargs):
+    invalidate_alarm_addresses(KeywordAddress.objects.filter(keyword_alarm_id=instance.id).values_list('address_id', flat=True))
+
+@receiver(pre_delete, sender=KeywordAlarm)
+def remember_alarm_addresses(sender, instance, **kwargs):
+    # SET_NULL clears keywordaddresses.keyword_alarm_id before post_delete runs
+    instance._alarm_address_ids = list(KeywordAddress.objects.filter(keyword_alarm_id=instance.id).values_list('address_id', flat=True))
+
+@receiver(post_delete, sender=KeywordAlarm)
+def invalidate_deleted_alarm_automaton(sender, instance, **kwargs):
+    invalidate_alarm_addresses(getattr(instance, '_alarm_address_ids', ()))
+
+@receiver(pre_save, sender=KeywordAddress)
+def remember_keyword_address(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = KeywordAddress.objects.filter(pk=instance.pk).values_list('address_id', flat=True).first()
+    instance._previous_address_id = previous
+
+@receiver(post_save, sender=KeywordAddress)
+@receiver(post_delete, sender=KeywordAddress)
+def invalidate_address_automaton(sender, instance, **kwargs):
+    # a moved subscription leaves a stale keyword at its old address as well
+    invalidate_alarm_addresses([instance.address_id, getattr(instance, '_previous_address_id', None)])
+
+@receiver(soft_deleted, sender=KeywordAlarm)
+def invalidate_deleted_alarms(sender, pks, **kwargs):
+    invalidate_alarm_addresses(KeywordAddress.objects.filter(keyword_alarm_id__in=pks).values_list('address_id', flat=True))
+
+@receiver(soft_deleted, sender=KeywordAddress)
+def invalidate_deleted_addresses(sender, pks, **kwargs):
+    invalidate_alarm_addresses(KeywordAddress.objects.filter(pk__in=pks).values_list('address_id', flat=True))
+
+@receiver(post_save, sender=Product)
+def match_keyword_alarms(sender, instance, created=False, **kwargs):
+    if created:
+        transaction.on_commit(lambda: notify_keyword_alarms(instance))
+
+def manner_contribution(user_id, manner_temperature_id, deleted_at):
+    if user_id is None or manner_temperature_id is None or deleted_at is not None:
+        return None
+    point = MannerTemperatureCategory.objects.alive().filter(id=manner_temperature_id).values_list('point', flat=True).first()
+    return (user_id, point) if point else None
+
+@receiver(pre_save, sender=MannerTemperature)
+def remember_manner_point(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = MannerTemperature.objects.filter(pk=instance.pk).values('user_id', 'manner_temperature_id', 'deleted_at').first()
+    instance._previous_manner = manner_contribution(**previous) if previous else None
+
+@receiver(post_save, sender=MannerTemperature)
+def update_manner_score(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_manner', None)
+    current  = manner_contribution(instance.user_id, instance.manner_temperature_id, instance.deleted_at)
+    if previous == current:
+        return
+
+    if previous:
+        User.adjust_manner_score(previous[0], -previous[1])
+    if current:
+        User.adjust_manner_score(*current)
+
+@receiver(post_delete, sender=MannerTemperature)
+def remove_manner_point(sender, instance, **kwargs):
+    current = manner_contribution(instance.user_id, instance.manner_temperature_id, instance.deleted_at)
+    if current:
+        User.adjust_manner_score(current[0], -current[1])
+
+@receiver(soft_deleted, sender=MannerTemperature)
+def recompute_deleted_manner(sender, pks, **kwargs):
+    user_ids = set(MannerTemperature.objects.filter(pk__in=pks, user__isnull=False).values_list('user_id', flat=True))
+    User.recompute_manner_scores(sorted(user_ids))
+
+def recompute_category_manner(category_ids, user_ids=None):
+    # a category's point is summed into every score that holds it, so changing it recomputes them all
+    if user_ids is None:
+        user_ids = MannerTemperature.objects.alive().filter(manner_temperature_id__in=category_ids, user__isnull=False)\
+            .values_list('user_id', flat=True)
+    user_ids = sorted(set(user_ids))
+    User.recompute_manner_scores(user_ids)
+    invalidate_profiles(user_ids)
+
+@receiver(post_save, sender=MannerTemperatureCategory)
+def recompute_saved_category_manner(sender, instance, created=False, **kwargs):
+    if not created:
+        recompute_category_manner([instance.id])
+
+@receiver(soft_deleted, sender=MannerTemperatureCategory)
+def recompute_deleted_category_manner(sender, pks, **kwargs):
+    recompute_category_manner(pks)
+
+@receiver(pre_delete, sender=MannerTemperatureCategory)
+def remember_category_users(sender, instance, **kwargs):
+    # SET_NULL clears mannertemperatures.manner_temperature_id before post_delete runs
+    instance._manner_user_ids = list(MannerTemperature.objects.alive().filter(manner_temperature_id=instance.id, user__isnull=False)
+        .values_list('user_id', flat=True))
+
+@receiver(post_delete, sender=MannerTemperatureCategory)
+def recompute_removed_category_manner(sender, instance, **kwargs):
+    recompute_category_manner([instance.id], getattr(instance, '_manner_user_ids', ()))
+
+@receiver(soft_deleted, sender=Wishlist)
+def recount_deleted_wishlists(sender, pks, **kwargs):
+    product_ids = set(Wishlist.objects.filter(pk__in=pks, product__isnull=False).values_list('product_id', flat=True))
+    recount_products(sorted(product_ids))
+
+@receiver(soft_deleted, sender=UploaderLike)
+def recount_deleted_uploader_likes(sender, pks, **kwargs):
+    user_ids = set(UploaderLike.objects.filter(pk__in=pks, uploader__isnull=False).values_list('uploader_id', flat=True))
+    recount_followers(sorted(user_ids))
+
+def invalidate_profiles(user_ids):
+    # after commit, so a concurrent request cannot cache the summary from before the write
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_profile(user_ids))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.id])
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_uploader_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.uploader_id])
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_reviewed_profile(sender, instance, **kwargs):
+    if instance.product_id:
+        invalidate_profiles(Product.objects.filter(id=instance.product_id).values_list('uploader_id', flat=True))
+
+@receiver(post_save, sender=UploaderLike)
+@receiver(post_delete, sender=UploaderLike)
+def invalidate_followed_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.uploader_id])
+
+@receiver(post_save, sender=FullAddress)
+@receiver(post_delete, sender=FullAddress)
+@receiver(post_save, sender=MannerTemperature)
+@receiver(post_delete, sender=MannerTemperature)
+def invalidate_own_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.user_id])
+
+@receiver(post_save, sender=OrderStatus)
+@receiver(post_delete, sender=OrderStatus)
+def clear_order_status_names(sender, **kwargs):
+    order_status_names.clear()
+
+PROFILE_OWNERS = {
+    User              : 'id',
+    Product           : 'uploader_id',
+    Review            : 'product__uploader_id',
+    UploaderLike      : 'uploader_id',
+    FullAddress       : 'user_id',
+    MannerTemperature : 'user_id',
+}
+
+@receiver(soft_deleted)
+def invalidate_deleted_profiles(sender, pks, **kwargs):
+    if sender is OrderStatus:
+        order_status_names.clear()
+    if sender in PROFILE_OWNERS:
+        invalidate_profiles(sender.objects.filter(pk__in=pks).values_list(PROFILE_OWNERS[sender], flat=True))
@@ -0,0 +1,150 @@
+import hmac, logging, secrets
+
+from datetime import timedelta
+
+from django.conf                 import settings
+from django.core.cache           import cache
+from django.db.models            import F, Q
+from django.utils                import timezone
+from django.utils.module_loading import import_string
+
+from .models import AuthSms
+
+logger = logging.getLogger(__name__)
+
+CODE_LENGTH = 6
+
+class SmsCodeStore:
+    """
+    Verification codes kept in the Django cache, with the authsms row as the durable
+    fallback: a correct code on a warm cache costs one UPDATE (which makes it single use
+    across processes), everything else reads the row once and warms the cache again.
+    Resend, hourly and attempt limits are counted in the default cache, which settings
+    point at the memcached shared by every worker, so each limit holds across processes;
+    with a per-process backend such as LocMem it would be multiplied by the worker count.
+    The database still sees the authsms upsert on issue, the row read on a cache miss or
+    mismatch, the consuming UPDATE and the attempts UPDATE on a failed verification.
+    Errors are raised as ValueError carrying the response message.
+    """
+    def __init__(self, ttl=180, max_attempts=5, resend_interval=30, hourly_limit=10):
+        self.ttl             = ttl
+        self.max_attempts    = max_attempts
+        self.resend_interval = resend_interval
+        self.hourly_limit    = hourly_limit
+
+    def key(self, kind, phone_number):
+        return f'sms:{kind}:{phone_number}'
+
+    def issue(self, phone_number):
+        if not cache.add(self.key('cooldown', phone_number), 1, self.resend_interval):
+            raise ValueError('TOO_MANY_REQUESTS')
+
+        if self.count(self.key('hourly', phone_number), 3600) > self.hourly_limit:
+            raise ValueError('TOO_MANY_REQUESTS')
+
+        code       = f'{secrets.randbelow(10 ** CODE_LENGTH):0{CODE_LENGTH}d}'
+        expires_at = timezone.now() + timedelta(seconds=self.ttl)
+        AuthSms.objects.update_or_create(phone_number=phone_number, defaults={
+            'auth_number' : int(code),
+            'attempts'    : 0,
+            'expires_at'  : expires_at,
+            'deleted_at'  : None,
+        })
+        cache.set(self.key('code', phone_number), (code, expires_at), self.ttl)
+        cache.set(self.key('attempts', phone_number), 0, self.ttl)
+        return code
+
+    def count(self, key, timeout):
+        """Atomically increments a counter that starts when it is first counted and lasts timeout seconds."""
+        if cache.add(key, 1, timeout):
+            return 1
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # expired between add and incr
+            cache.add(key, 1, timeout)
+            return 1
+
+    def load(self, phone_number):
+        row = AuthSms.objects.alive().filter(phone_number=phone_number, expires_at__gt=timezone.now()) \
+            .values_list('auth_number', 'expires_at', 'attempts').first()
+        if row is None:
+            return None
+
+        auth_number, expires_at, attempts = row
+        entry     = (f'{auth_number:0{CODE_LENGTH}d}', expires_at)
+        remaining = max(int((expires_at - timezone.now()).total_seconds()), 1)
+        cache.set(self.key('code', phone_number), entry, remaining)
+        cache.set(self.key('attempts', phone_number), attempts, remaining)
+        return entry
+
+    def matches(self, entry, code):
+        return entry[1] > timezone.now() and hmac.compare_digest(entry[0].encode(), str(code).encode())
+
+    def verify(self, phone_number, code):
+        if cache.get(self.key('attempts', phone_number), 0) >= self.max_attempts:
+            raise ValueError('TOO_MANY_ATTEMPTS')
+
+        # A cached code can be stale when another process re-issued it, so a mismatch
+        # is checked against the row before it counts as a failed attempt.
+        entry = cache.get(self.key('code', phone_number))
+        if entry is None or not self.matches(entry, code):
+            entry = self.load(phone_number)
+        if entry is None:
+            return False
+
+        if cache.get(self.key('attempts', phone_number), 0) >= self.max_attempts:
+            raise ValueError('TOO_MANY_ATTEMPTS')
+
+        if self.matches(entry, code) and self.consume(phone_number, entry[0]):
+            return True
+
+        self.record_failure(phone_number, entry[1])
+        return False
+
+    def consume(self, phone_number, code):
+        now      = timezone.now()
+        consumed = AuthSms.objects.alive().filter(
+            phone_number   = phone_number,
+            auth_number    = int(code),
+            expires_at__gt = now,
+            attempts__lt   = self.max_attempts,
+        ).update(expires_at=now)
+
+        cache.delete_many([self.key('code', phone_number), self.key('attempts', phone_number)])
+        return consumed == 1
+
+    def record_failure(self, phone_number, expires_at):
+        remaining = max(int((expires_at - timezone.now()).total_seconds()), 1)
+        self.count(self.key('attempts', phone_number), remaining)
+        AuthSms.objects.filter(phone_number=phone_number).update(attempts=F('attempts') + 1)
+
+    def expired(self):
+        now = timezone.now()
+        return AuthSms.objects.filter(
+            Q(expires_at__lte=now) | Q(expires_at__isnull=True, created_at__lte=now - timedelta(seconds=self.ttl))
+        )
+
+    def purge(self, batch_size=1000):
+        """Deletes expired codes batch_size rows at a time, keeping each DELETE short."""
+        purged = 0
+        while True:
+            ids = list(self.expired().order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return purged
+            purged += AuthSms.objects.filter(id__in=ids).delete()[0]
+
+sms_store = SmsCodeStore(
+    ttl             = getattr(settings, 'SMS_CODE_TTL', 180),
+    max_attempts    = getattr(settings, 'SMS_MAX_ATTEMPTS', 5),
+    resend_interval = getattr(settings, 'SMS_RESEND_INTERVAL', 30),
+    hourly_limit    = getattr(settings, 'SMS_HOURLY_LIMIT', 10),
+)
+
+def send_code(phone_number, code):
+    """Hands the code to the callable named by SMS_SENDER(phone_number, message)."""
+    sender = getattr(settings, 'SMS_SENDER', None)
+    if not sender:
+        logger.warning('SMS_SENDER is not configured, code for %s was not sent', phone_number)
+        return
+    import_string(sender)(phone_number, f'[kiwimarket] verification code {code}')
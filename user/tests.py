@@ -1,3 +1,364 @@
-from django.test import TestCase
+import io, jwt, random
 
-# Create your tests here.
+from decimal       import Decimal
+from unittest.mock import patch
+
+from django.core.cache      import cache
+from django.core.management import call_command
+from django.db              import DatabaseError, transaction
+from django.http            import JsonResponse
+from django.test            import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils           import timezone
+
+from my_settings    import SECRET_KEY, ALGORITHM
+from product.models import Product, ProductImage
+from utils          import auth_cache, login_check
+
+from .alarms  import KeywordAutomaton, AlarmQueue, alarm_matcher
+from .likes   import set_uploader_like
+from .orders  import order_status_names
+from .profile import build_profiles, get_profile, get_profiles
+from .sms     import SmsCodeStore
+from .models  import (
+    BASE_MANNER_TEMPERATURE,
+    User,
+    AuthSms,
+    Address,
+    KeywordAlarm,
+    KeywordAddress,
+    KeywordNotification,
+    MannerTemperature,
+    MannerTemperatureCategory,
+    Wishlist,
+    Order,
+    OrderStatus
+)
+
+def make_user(index, **fields):
+    return User.objects.create(
+        phone_number = f'+8210{index:08d}',
+        nickname     = f'user{index}',
+        email        = f'user{index}@kiwimarket.com',
+        **fields
+    )
+
+def make_address(code, latitude=37.5, longitude=127.0):
+    return Address.objects.create(address=f'동네{code}', code=code, latitude=Decimal(latitude), longitude=Decimal(longitude))
+
+def make_product(name, **fields):
+    return Product.objects.create(name=name, price=Decimal(1000), description='', **fields)
+
+def token_for(user):
+    return jwt.encode({'user_id' : user.id}, SECRET_KEY, algorithm=ALGORITHM)
+
+@login_check
+def whoami(request):
+    request.user.scratch = request.GET.get('scratch')
+    return JsonResponse({"id" : request.user.id, "nickname" : request.user.nickname})
+
+class LoginCheckTest(TransactionTestCase):
+    # user changes invalidate the cache in transaction.on_commit, so these tests commit
+    def setUp(self):
+        cache.clear()
+        auth_cache.clear()
+        self.factory = RequestFactory()
+        self.user    = make_user(1)
+        self.token   = token_for(self.user)
+
+    def call(self, **params):
+        return whoami(self.factory.get('/', params, HTTP_AUTHORIZATION=self.token))
+
+    def test_cached_user_is_fresh_per_request(self):
+        first  = self.factory.get('/', {'scratch' : 'first'}, HTTP_AUTHORIZATION=self.token)
+        second = self.factory.get('/', HTTP_AUTHORIZATION=self.token)
+        whoami(first)
+        whoami(second)
+
+        self.assertIsNot(first.user, second.user)
+        self.assertIsNone(second.user.scratch)
+
+    def test_cache_hit_skips_the_database(self):
+        self.call()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.call().status_code, 200)
+
+    def test_change_is_seen_on_next_request(self):
+        self.call()
+        self.user.nickname = 'renamed'
+        self.user.save()
+
+        self.assertJSONEqual(self.call().content, {"id" : self.user.id, "nickname" : "renamed"})
+
+    def test_soft_deleted_user_is_refused(self):
+        self.call()
+        User.objects.filter(id=self.user.id).soft_delete()
+
+        self.assertEqual(self.call().status_code, 400)
+
+class KeywordAutomatonTest(SimpleTestCase):
+    def test_matches_every_contained_keyword(self):
+        rng      = random.Random(7)
+        keywords = {''.join(rng.choices('abc', k=rng.randint(1, 4))) for _ in range(30)}
+        automaton = KeywordAutomaton(keywords)
+        for _ in range(200):
+            text = ''.join(rng.choices('abc', k=rng.randint(0, 20)))
+            self.assertEqual(automaton.search(text), {keyword for keyword in keywords if keyword in text})
+
+class AlarmMatcherTest(TransactionTestCase):
+    # alarm changes invalidate the automaton in transaction.on_commit, so these tests commit
+    def setUp(self):
+        cache.clear()
+        self.address    = make_address(1)
+        self.subscriber = make_user(1)
+        self.alarm      = KeywordAlarm.objects.create(keyword='아이폰', user=self.subscriber)
+        self.link       = KeywordAddress.objects.create(keyword_alarm=self.alarm, address=self.address)
+        self.product    = Product(name='아이폰 12 팝니다', description='', address=self.address, uploader=make_user(2))
+
+    def test_matches_keyword_at_address(self):
+        self.assertEqual(alarm_matcher.match(self.product), [(self.alarm.id, self.subscriber.id)])
+
+    def test_deleted_alarm_stops_matching(self):
+        alarm_matcher.match(self.product)
+        self.alarm.delete()
+
+        self.assertEqual(alarm_matcher.match(self.product), [])
+
+    def test_moved_subscription_stops_matching_at_old_address(self):
+        alarm_matcher.match(self.product)
+        self.link.address = make_address(2)
+        self.link.save()
+
+        self.assertEqual(alarm_matcher.match(self.product), [])
+
+    def test_rolled_back_alarm_keeps_the_automaton(self):
+        alarm_matcher.match(self.product)
+        with patch.object(alarm_matcher, 'invalidate') as invalidate:
+            with transaction.atomic():
+                KeywordAddress.objects.create(keyword_alarm=self.alarm, address=make_address(3))
+                transaction.set_rollback(True)
+
+        invalidate.assert_not_called()
+
+class AlarmQueueTest(TransactionTestCase):
+    # SQLite checks foreign keys at commit, so the queue's transactions have to commit
+    def setUp(self):
+        self.queue   = AlarmQueue(flush_interval=3600, batch_size=100, max_retries=2, max_pending=5)
+        self.user    = make_user(1)
+        self.alarm   = KeywordAlarm.objects.create(keyword='아이폰', user=self.user)
+        self.product = make_product('아이폰')
+
+    def tearDown(self):
+        # the queue flushes once more at interpreter exit, after the test database is gone
+        self.queue.pending = []
+
+    def notification(self, product_id=None):
+        return KeywordNotification(keyword_alarm_id=self.alarm.id, user_id=self.user.id, product_id=product_id or self.product.id)
+
+    def test_rows_for_deleted_products_are_dropped(self):
+        gone = make_product('갤럭시')
+        self.queue.pending = [self.notification(), self.notification(gone.id)]
+        gone.delete()
+
+        with self.assertLogs('user.alarms', 'WARNING'):
+            self.assertEqual(self.queue.flush(), 1)
+        self.assertEqual(KeywordNotification.objects.count(), 1)
+        self.assertEqual(self.queue.pending, [])
+
+    def test_failing_rows_are_retried_a_bounded_number_of_times(self):
+        self.queue.pending = [self.notification()]
+        with patch.object(self.queue, 'insert', side_effect=DatabaseError), self.assertLogs('user.alarms', 'WARNING'):
+            self.queue.flush()
+            self.assertEqual(len(self.queue.pending), 1)
+            self.queue.flush()
+
+        self.assertEqual(self.queue.pending, [])
+
+    def test_queue_size_is_capped(self):
+        self.queue.failing = True
+        with patch.object(self.queue, 'start'), self.assertLogs('user.alarms', 'ERROR'):
+            self.queue.enqueue([self.notification() for _ in range(8)])
+
+        self.assertEqual(len(self.queue.pending), 5)
+
+class SmsCodeStoreTest(TestCase):
+    phone_number = '+821012345678'
+
+    def setUp(self):
+        cache.clear()
+        self.store = SmsCodeStore(ttl=180, max_attempts=2, resend_interval=30, hourly_limit=2)
+
+    def test_resend_waits_for_the_cooldown(self):
+        self.store.issue(self.phone_number)
+        with self.assertRaisesMessage(ValueError, 'TOO_MANY_REQUESTS'):
+            self.store.issue(self.phone_number)
+
+    def test_hourly_limit(self):
+        for _ in range(2):
+            self.store.issue(self.phone_number)
+            cache.delete(self.store.key('cooldown', self.phone_number))
+        with self.assertRaisesMessage(ValueError, 'TOO_MANY_REQUESTS'):
+            self.store.issue(self.phone_number)
+
+    def test_code_is_single_use(self):
+        code = self.store.issue(self.phone_number)
+
+        self.assertTrue(self.store.verify(self.phone_number, code))
+        self.assertFalse(self.store.verify(self.phone_number, code))
+
+    def test_attempts_are_limited_even_after_the_cache_is_lost(self):
+        code  = self.store.issue(self.phone_number)
+        wrong = f'{(int(code) + 1) % 10 ** 6:06d}'
+        self.assertFalse(self.store.verify(self.phone_number, wrong))
+        self.assertFalse(self.store.verify(self.phone_number, wrong))
+        cache.clear()
+
+        with self.assertRaisesMessage(ValueError, 'TOO_MANY_ATTEMPTS'):
+            self.store.verify(self.phone_number, code)
+
+    def test_purge_deletes_only_expired_codes(self):
+        for index in range(5):
+            self.store.issue(f'+8210000000{index:02d}')
+        AuthSms.objects.filter(phone_number__in=[f'+8210000000{index:02d}' for index in range(3)]).update(expires_at=timezone.now())
+
+        self.assertEqual(self.store.purge(batch_size=2), 3)
+        self.assertEqual(AuthSms.objects.count(), 2)
+
+class MannerScoreTest(TestCase):
+    def setUp(self):
+        self.kind   = MannerTemperatureCategory.objects.create(name='친절해요', point=Decimal('0.5'))
+        self.rude   = MannerTemperatureCategory.objects.create(name='불친절해요', point=Decimal('-0.2'))
+        self.first  = make_user(1)
+        self.second = make_user(2)
+
+    def score(self, user):
+        return User.objects.get(id=user.id).manner_score
+
+    def test_score_follows_manner_changes(self):
+        kind = MannerTemperature.objects.create(user=self.first, manner_temperature=self.kind)
+        rude = MannerTemperature.objects.create(user=self.first, manner_temperature=self.rude)
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE + Decimal('0.3'))
+
+        rude.user = self.second
+        rude.save()
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE + Decimal('0.5'))
+        self.assertEqual(self.score(self.second), BASE_MANNER_TEMPERATURE - Decimal('0.2'))
+
+        MannerTemperature.objects.filter(id=kind.id).soft_delete()
+        rude.delete()
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE)
+        self.assertEqual(self.score(self.second), BASE_MANNER_TEMPERATURE)
+
+    def test_score_follows_category_changes(self):
+        MannerTemperature.objects.create(user=self.first, manner_temperature=self.kind)
+        MannerTemperature.objects.create(user=self.first, manner_temperature=self.rude)
+        MannerTemperature.objects.create(user=self.second, manner_temperature=self.kind)
+
+        self.kind.point = Decimal('0.7')
+        self.kind.save()
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE + Decimal('0.5'))
+        self.assertEqual(self.score(self.second), BASE_MANNER_TEMPERATURE + Decimal('0.7'))
+
+        MannerTemperatureCategory.objects.filter(id=self.rude.id).soft_delete()
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE + Decimal('0.7'))
+
+        self.kind.delete()
+        self.assertEqual(self.score(self.first), BASE_MANNER_TEMPERATURE)
+        self.assertEqual(self.score(self.second), BASE_MANNER_TEMPERATURE)
+
+class LikeCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user    = make_user(1)
+        self.token   = token_for(self.user)
+        self.product = make_product('아이폰')
+
+    def like_count(self):
+        return Product.objects.get(id=self.product.id).like_count
+
+    def test_repeated_toggles_move_the_counter_once(self):
+        for method, expected in ((self.client.post, 1), (self.client.post, 1), (self.client.delete, 0), (self.client.delete, 0)):
+            response = method(f'/product/{self.product.id}/like', HTTP_AUTHORIZATION=self.token)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.like_count(), expected)
+
+    def test_follower_count(self):
+        uploader = make_user(2)
+        self.assertTrue(set_uploader_like(self.user, uploader.id, True))
+        self.assertFalse(set_uploader_like(self.user, uploader.id, True))
+
+        self.assertEqual(User.objects.get(id=uploader.id).follower_count, 1)
+
+    def test_soft_deleted_likes_are_recounted(self):
+        self.client.post(f'/product/{self.product.id}/like', HTTP_AUTHORIZATION=self.token)
+        Wishlist.objects.filter(product=self.product).soft_delete()
+
+        self.assertEqual(self.like_count(), 0)
+
+    def test_reconcile_fixes_drifted_counters(self):
+        self.client.post(f'/product/{self.product.id}/like', HTTP_AUTHORIZATION=self.token)
+        Product.objects.filter(id=self.product.id).update(like_count=7)
+
+        call_command('reconcile_like_counts', stdout=io.StringIO())
+
+        self.assertEqual(self.like_count(), 1)
+
+class ProfileTest(TransactionTestCase):
+    # product changes invalidate the summary in transaction.on_commit, so these tests commit
+    def setUp(self):
+        cache.clear()
+        self.users = [make_user(index) for index in range(3)]
+
+    def test_batch_costs_the_same_queries_for_any_number_of_users(self):
+        for user in self.users:
+            make_product('아이폰', uploader=user)
+        with self.assertNumQueries(4):
+            profiles = build_profiles([user.id for user in self.users])
+        self.assertEqual([profiles[user.id]["on_sale_count"] for user in self.users], [1, 1, 1])
+
+    def test_cached_profile_is_refreshed_after_a_new_listing(self):
+        user = self.users[0]
+        self.assertEqual(get_profile(user.id)["on_sale_count"], 0)
+        with self.assertNumQueries(0):
+            get_profiles([user.id])
+
+        make_product('아이폰', uploader=user)
+
+        self.assertEqual(get_profile(user.id)["on_sale_count"], 1)
+
+    def test_profiles_endpoint_rejects_bad_ids(self):
+        self.assertEqual(self.client.get('/user/profiles', {'ids' : '1,x'}).status_code, 400)
+        response = self.client.get('/user/profiles', {'ids' : f'{self.users[0].id},0'})
+        self.assertEqual([profile["id"] for profile in response.json()["result"]], [self.users[0].id])
+
+class OrderTimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        order_status_names.clear()
+        self.buyer  = make_user(1)
+        self.seller = make_user(2)
+        sold        = OrderStatus.objects.create(name=OrderStatus.SOLD)
+        self.orders = []
+        for index in range(25):
+            product = make_product(f'product {index}', uploader=self.seller, order_status=sold)
+            ProductImage.objects.create(product=product, image_url=f'https://images.kiwimarket.com/{product.id}.jpg')
+            self.orders.append(Order.objects.create(product=product, user=self.buyer))
+
+    def timeline(self, role, user, **params):
+        return self.client.get(f'/user/orders/{role}', params, HTTP_AUTHORIZATION=token_for(user))
+
+    def test_seller_is_copied_from_the_product(self):
+        self.assertEqual({order.seller_id for order in self.orders}, {self.seller.id})
+
+    def test_pages_walk_each_side_newest_first(self):
+        expected = [order.id for order in reversed(self.orders)]
+        for role, user in (('purchases', self.buyer), ('sales', self.seller)):
+            first  = self.timeline(role, user).json()
+            second = self.timeline(role, user, cursor=first['next_cursor']).json()
+            self.assertEqual([order['id'] for order in first['result'] + second['result']], expected)
+            self.assertIsNone(second['next_cursor'])
+            self.assertEqual(first['result'][0]['product']['order_status'], OrderStatus.SOLD)
+
+        self.assertEqual(self.timeline('sales', self.buyer).json()['result'], [])
+
+    def test_invalid_role(self):
+        self.assertEqual(self.timeline('refunds', self.buyer).status_code, 400)
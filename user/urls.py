@@ -0,0 +1,19 @@
+from django.urls import path
+
+from .views import (
+    UploaderLikeView,
+    UserProfileView,
+    UserProfilesView,
+    OrderTimelineView,
+    SmsSendView,
+    SmsVerifyView
+)
+
+urlpatterns = [
+    path('/sms', SmsSendView.as_view()),
+    path('/sms/verify', SmsVerifyView.as_view()),
+    path('/profiles', UserProfilesView.as_view()),
+    path('/orders/<str:role>', OrderTimelineView.as_view()),
+    path('/<int:user_id>/profile', UserProfileView.as_view()),
+    path('/<int:user_id>/like', UploaderLikeView.as_view()),
+]
@@ -1,3 +1,112 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.views                  import View
+from django.http                   import JsonResponse
+from phonenumber_field.phonenumber import to_python
+
+from utils import login_check
+
+from .likes   import set_uploader_like
+from .models  import User
+from .orders  import order_timeline, serialize_orders
+from .profile import get_profile, get_profiles
+from .sms     import sms_store, send_code
+
+PROFILE_BATCH_LIMIT = 100
+
+def phone_number_of(data):
+    phone_number = to_python(data.get('phone_number'))
+    if phone_number is None or not phone_number.is_valid():
+        raise ValueError('INVALID_PHONE_NUMBER')
+    return phone_number.as_e164
+
+class UploaderLikeView(View):
+    @login_check
+    def post(self, request, user_id):
+        return self.set_liked(request, user_id, True)
+
+    @login_check
+    def delete(self, request, user_id):
+        return self.set_liked(request, user_id, False)
+
+    def set_liked(self, request, user_id, liked):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        if user_id == request.user.id:
+            return JsonResponse({"message" : "CANNOT_FOLLOW_SELF"}, status=400)
+
+        if not User.objects.alive().filter(id=user_id).exists():
+            return JsonResponse({"message" : "USER_DOES_NOT_EXIST"}, status=404)
+
+        set_uploader_like(request.user, user_id, liked)
+
+        return JsonResponse({
+            "message"        : "SUCCESS",
+            "is_liked"       : liked,
+            "follower_count" : User.objects.filter(id=user_id).values_list('follower_count', flat=True).first(),
+        }, status=200)
+
+class SmsSendView(View):
+    def post(self, request):
+        try:
+            phone_number = phone_number_of(json.loads(request.body))
+            code         = sms_store.issue(phone_number)
+        except json.JSONDecodeError:
+            return JsonResponse({"message" : "INVALID_JSON"}, status=400)
+        except ValueError as error:
+            return JsonResponse({"message" : str(error)}, status=429 if str(error) == 'TOO_MANY_REQUESTS' else 400)
+
+        send_code(phone_number, code)
+        return JsonResponse({"message" : "SUCCESS", "expires_in" : sms_store.ttl}, status=200)
+
+class SmsVerifyView(View):
+    def post(self, request):
+        try:
+            data         = json.loads(request.body)
+            phone_number = phone_number_of(data)
+            verified     = sms_store.verify(phone_number, data.get('auth_number', ''))
+        except json.JSONDecodeError:
+            return JsonResponse({"message" : "INVALID_JSON"}, status=400)
+        except ValueError as error:
+            return JsonResponse({"message" : str(error)}, status=429 if str(error) == 'TOO_MANY_ATTEMPTS' else 400)
+
+        if not verified:
+            return JsonResponse({"message" : "INVALID_AUTH_NUMBER"}, status=400)
+        return JsonResponse({"message" : "SUCCESS"}, status=200)
+
+class UserProfileView(View):
+    def get(self, request, user_id):
+        profile = get_profile(user_id)
+        if not profile:
+            return JsonResponse({"message" : "USER_DOES_NOT_EXIST"}, status=404)
+
+        return JsonResponse({"message" : "SUCCESS", "result" : profile}, status=200)
+
+class UserProfilesView(View):
+    def get(self, request):
+        ids = [id for id in request.GET.get('ids', '').split(',') if id]
+        if not ids or not all(id.isdigit() for id in ids):
+            return JsonResponse({"message" : "INVALID_IDS"}, status=400)
+        if len(ids) > PROFILE_BATCH_LIMIT:
+            return JsonResponse({"message" : "TOO_MANY_IDS"}, status=400)
+
+        profiles = get_profiles([int(id) for id in ids])
+        return JsonResponse({"message" : "SUCCESS", "result" : list(profiles.values())}, status=200)
+
+class OrderTimelineView(View):
+    @login_check
+    def get(self, request, role):
+        if not request.user:
+            return JsonResponse({"message" : "UNAUTHORIZED"}, status=401)
+
+        try:
+            orders, next_cursor = order_timeline(request.user, role, cursor=request.GET.get('cursor', None))
+        except ValueError as error:
+            return JsonResponse({"message" : str(error)}, status=400)
+
+        return JsonResponse({
+            "message"     : "SUCCESS",
+            "result"      : serialize_orders(orders),
+            "next_cursor" : next_cursor,
+        }, status=200)
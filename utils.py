@@ -1,23 +1,221 @@
-import json, bcrypt, jwt, re, random
+import json, bcrypt, jwt, re, random, base64, binascii, asyncio, threading, time, datetime
 
-from django.http import JsonResponse
+from collections import OrderedDict
+from functools   import wraps
+
+from asgiref.sync                 import sync_to_async
+from django.http                  import JsonResponse, HttpRequest
+from django.db                    import close_old_connections, DEFAULT_DB_ALIAS
+from django.core.cache            import cache
+from django.db.models             import Q
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions       import ValidationError
 from my_settings import SECRET_KEY, ALGORITHM
 
+from user.models import User
+
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL  = 300
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries also expire after ttl seconds.
+    Safe to share between the threads of one worker; each process keeps its own copy.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self.entries = OrderedDict()
+        self.lock    = threading.Lock()
+        self.hits    = 0
+        self.misses  = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            while len(self.entries) > self.maxsize:
+                self._discard(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._discard(key)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._discard(key)
+
+    def stats(self):
+        return {"size" : len(self.entries), "hits" : self.hits, "misses" : self.misses}
+
+    def _discard(self, key):
+        self.entries.pop(key, None)
+
+class AuthUserCache(TTLCache):
+    """
+    Access token to user id in this process, in front of the user's field values in the
+    shared Django cache. Every request gets a fresh User built from those values, and
+    invalidate_user drops the shared entry, so a changed or deleted user is reloaded by
+    every worker on its next request.
+    """
+    USER_KEY = 'auth_user:{}'
+
+    def user_for(self, access_token):
+        user_id = self.get(access_token)
+        if user_id is None:
+            return None
+
+        values = cache.get(self.USER_KEY.format(user_id))
+        if values is None:
+            return None
+        return User.from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+    def remember(self, access_token, user, ttl):
+        self.set(access_token, user.id, ttl)
+        cache.set(self.USER_KEY.format(user.id), {
+            field.attname : getattr(user, field.attname) for field in User._meta.concrete_fields
+        }, self.ttl)
+
+    def invalidate_user(self, user_id):
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        cache.delete_many([self.USER_KEY.format(user_id) for user_id in user_ids])
+
+auth_cache = AuthUserCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+def load_user(access_token):
+    payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+    user    = User.objects.alive().get(id=payload['user_id'])
+
+    ttl = AUTH_CACHE_TTL
+    if 'exp' in payload:
+        ttl = min(ttl, payload['exp'] - time.time())
+    if ttl > 0:
+        auth_cache.remember(access_token, user, ttl)
+    return user
+
 def login_check(func):
-    def wrapper(self, request, *args, **kwargs):
+    """
+    Sets request.user from the Authorization header, or None when there is no token.
+    Users are served from auth_cache, so only a cache miss touches the database.
+    request.user is a fresh instance each time, never shared between requests.
+    Works on both sync views and async views.
+    """
+    def find_request(args):
+        return next(arg for arg in args if isinstance(arg, HttpRequest))
+
+    def error_response(error):
+        if isinstance(error, User.DoesNotExist):
+            return JsonResponse({"message" : "INVALID_USER"}, status=400)
+        return JsonResponse({"message" : "INVALID_TOKEN"}, status=400)
+
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            request      = find_request(args)
+            access_token = request.headers.get('Authorization', None)
+            try:
+                if access_token == None:
+                    request.user = None
+                else:
+                    request.user = await sync_to_async(auth_cache.user_for)(access_token) or await sync_to_async(load_user)(access_token)
+
+            except (User.DoesNotExist, jwt.exceptions.InvalidTokenError, KeyError) as error:
+                return error_response(error)
+
+            return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        request      = find_request(args)
         access_token = request.headers.get('Authorization', None)
         try:
             if access_token == None:
                 request.user = None
             else:
-                payload = jwt.decode(access_token, SECRET_KEY, algorithm=ALGORITHM)
-                user = User.objects.get(id=payload['user_id'])
-                request.user = user
-            
-        except User.DoesNotExist:
-            return JsonResponse({"message" : "INVALID_USER"}, status=400)
-        except jwt.exceptions.DecodeError:
-            return JsonResponse({"message" : "INVALID_TOKEN"}, status=400)
-        
-        return func(self, request, *args, **kwargs)
+                request.user = auth_cache.user_for(access_token) or load_user(access_token)
+
+        except (User.DoesNotExist, jwt.exceptions.InvalidTokenError, KeyError) as error:
+            return error_response(error)
+
+        return func(*args, **kwargs)
     return wrapper
+
+def run_query(func):
+    """
+    Runs blocking ORM code from an async view on a worker thread of its own, so several
+    queries awaited together with asyncio.gather hit the database concurrently.
+    """
+    def call():
+        close_old_connections()
+        return func()
+    return sync_to_async(call, thread_sensitive=False)()
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes to milliseconds, which would skip or repeat rows
+    # that differ only in microseconds, so cursors keep the full isoformat value.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=CursorEncoder).encode()).decode()
+
+def decode_cursor(cursor, model, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('INVALID_CURSOR')
+
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError('INVALID_CURSOR')
+    try:
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+    except ValidationError:
+        raise ValueError('INVALID_CURSOR')
+
+def keyset_paginate(queryset, ordering, cursor=None, limit=20):
+    """
+    Pages through queryset on ordering, e.g. ('-created_at', '-id'), without OFFSET.
+    Every field in ordering runs in the same direction and the last one is unique,
+    so a matching composite index serves any page as cheaply as the first.
+    Raises ValueError for a malformed cursor.
+    """
+    fields     = [field.lstrip('-') for field in ordering]
+    descending = ordering[0].startswith('-')
+    queryset   = queryset.order_by(*ordering)
+
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, fields)
+        lookup = 'lt' if descending else 'gt'
+        after  = Q()
+        for index, field in enumerate(fields):
+            q = Q(**{f'{field}__{lookup}' : values[index]})
+            for equal_field, equal_value in zip(fields[:index], values[:index]):
+                q &= Q(**{equal_field : equal_value})
+            after |= q
+        queryset = queryset.filter(after)
+
+    rows        = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows        = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], queryset.model._meta.get_field(field).attname) for field in fields])
+    return rows, next_cursor
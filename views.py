@@ -0,0 +1,26 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from kiwimarket.metrics import registry
+
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+METRICS_TOKEN       = getattr(settings, 'METRICS_TOKEN', None)
+
+def metrics_allowed(request):
+    """
+    Scrapers send `Authorization: Bearer <METRICS_TOKEN>`, or connect from METRICS_ALLOWED_IPS.
+    REMOTE_ADDR is the peer address: behind a reverse proxy on the same host every request
+    comes from loopback, so only list addresses that reach the app server directly.
+    """
+    if request.META.get('REMOTE_ADDR') in METRICS_ALLOWED_IPS:
+        return True
+    token = request.headers.get('Authorization', '')
+    return bool(METRICS_TOKEN) and hmac.compare_digest(token, f'Bearer {METRICS_TOKEN}')
+
+def metrics(request):
+    if not metrics_allowed(request):
+        return JsonResponse({"message" : "FORBIDDEN"}, status=403)
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')